@@ -0,0 +1,162 @@
+"""Compare the old browser setup with the lean profile on a local fixture site.
+
+The fixture pages carry what real result pages do besides the data: large images,
+a web font, an autoplaying video and a tracker script that keeps sending beacons.
+Each mode runs in its own interpreter so the CPU time and peak memory of its
+Chromium processes can be read back from getrusage.
+Run: python bench_lean_browser.py --pages 10
+"""
+import argparse
+import functools
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict
+
+from playwright.sync_api import sync_playwright
+
+from lean_browser import context_options, install_sync, launch_options
+
+IMAGES_PER_PAGE = 6
+
+PAGE_TEMPLATE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Fixture page {number}</title>
+<style>
+  @font-face {{ font-family: Brand; src: url(/brand.woff2) format("woff2"); }}
+  body {{ font-family: Brand, sans-serif; }}
+  img {{ width: 300px; }}
+</style>
+<script src="http://localhost:{port}/tracker.js"></script>
+</head><body>
+<h1>Results page {number}</h1>
+<video src="/promo.mp4" autoplay muted loop preload="auto"></video>
+{images}
+{results}
+</body></html>
+"""
+
+# Sends a beacon every 100 ms, like analytics and session-replay scripts
+TRACKER_JS = "setInterval(() => fetch('/beacon?' + Date.now()).catch(() => {}), 100);"
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def bmp(width: int, height: int) -> bytes:
+    """Uncompressed 24-bit BMP filled with noise - big to download and to decode"""
+    row = (width * 3 + 3) & ~3
+    pixels = bytes(random.getrandbits(8) for _ in range(row)) * height
+    header = b"BM" + (54 + len(pixels)).to_bytes(4, "little") + b"\0\0\0\0" + (54).to_bytes(4, "little")
+    info = (40).to_bytes(4, "little") + width.to_bytes(4, "little") + height.to_bytes(4, "little")
+    info += (1).to_bytes(2, "little") + (24).to_bytes(2, "little") + bytes(24)
+    return header + info + pixels
+
+
+def build_site(directory: Path, pages: int, port: int):
+    """Write the fixture pages and their assets"""
+    for i in range(IMAGES_PER_PAGE):
+        (directory / f"photo{i}.bmp").write_bytes(bmp(600, 400))
+    (directory / "brand.woff2").write_bytes(os.urandom(300_000))
+    (directory / "promo.mp4").write_bytes(os.urandom(2_000_000))
+    (directory / "tracker.js").write_text(TRACKER_JS)
+    (directory / "beacon").write_text("")
+    for number in range(pages):
+        images = "\n".join(f'<img src="/photo{i}.bmp?page={number}">' for i in range(IMAGES_PER_PAGE))
+        results = "\n".join(f'<p><a href="https://www.facebook.com/advertiser-{number}-{i}/">Advertiser {i}</a></p>'
+                            for i in range(20))
+        page = PAGE_TEMPLATE.format(number=number, port=port, images=images, results=results)
+        (directory / f"page{number}.html").write_text(page)
+
+
+def serve(directory: Path) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=str(directory)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_mode(mode: str, base_url: str, pages: int, dwell_ms: int) -> Dict:
+    """Visit every fixture page in one browser; runs inside the child interpreter"""
+    received = 0
+    start = time.perf_counter()
+    with sync_playwright() as playwright:
+        if mode == "lean":
+            browser = playwright.chromium.launch(**launch_options())
+            context = browser.new_context(**context_options())
+            request_filter = install_sync(context)
+        else:
+            # The setup the scrapers used before: default flags, full HD viewport, nothing blocked
+            browser = playwright.chromium.launch(headless=os.getenv("BROWSER_HEADLESS", "1") == "1")
+            context = browser.new_context(viewport={"width": 1920, "height": 1080})
+            request_filter = None
+        page = context.new_page()
+
+        def count_bytes(response):
+            nonlocal received
+            try:
+                received += len(response.body())
+            except Exception:
+                pass
+
+        page.on("response", count_bytes)
+        for number in range(pages):
+            page.goto(f"{base_url}/page{number}.html", wait_until="load")
+            # Time on the page, as a scraper spends reading it
+            page.wait_for_timeout(dwell_ms)
+        browser.close()
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "seconds": time.perf_counter() - start,
+        "cpu_seconds": usage.ru_utime + usage.ru_stime,
+        "peak_rss_mb": usage.ru_maxrss / 1024,
+        "received_mb": received / 1_000_000,
+        "blocked": request_filter.blocked if request_filter else 0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Old browser setup vs lean profile: time, CPU, memory, bytes per page")
+    parser.add_argument("--pages", type=int, default=10, help="Fixture pages to visit per mode")
+    parser.add_argument("--dwell-ms", type=int, default=1000, help="Time spent on each page")
+    parser.add_argument("--child", choices=["old", "lean"], help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.child, args.base_url, args.pages, args.dwell_ms)))
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        server = serve(Path(directory))
+        port = server.server_port
+        build_site(Path(directory), args.pages, port)
+        # The page is served from 127.0.0.1, so its tracker on localhost is a third party
+        env = {**os.environ, "BROWSER_BLOCK_DOMAINS": "localhost"}
+
+        results = {}
+        for mode in ("old", "lean"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", mode, "--base-url", f"http://127.0.0.1:{port}",
+                 "--pages", str(args.pages), "--dwell-ms", str(args.dwell_ms)],
+                capture_output=True, text=True, env=env, check=True
+            ).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+        server.shutdown()
+
+    print(f"\n{'per page':<14} {'old':>10} {'lean':>10}")
+    for key, label in [("seconds", "wall s"), ("cpu_seconds", "CPU s"), ("received_mb", "received MB")]:
+        old, lean = results["old"][key] / args.pages, results["lean"][key] / args.pages
+        print(f"{label:<14} {old:10.3f} {lean:10.3f}  ({(1 - lean / old) * 100 if old else 0:.0f}% less)")
+    print(f"{'peak RSS MB':<14} {results['old']['peak_rss_mb']:10.0f} {results['lean']['peak_rss_mb']:10.0f}"
+          f"  (largest Chromium process)")
+    print(f"Requests blocked by the lean profile: {results['lean']['blocked']}")
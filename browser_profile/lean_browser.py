@@ -0,0 +1,120 @@
+"""Lean Chromium profile shared by the scrapers in this repo (fbads_collector, ytscaper).
+
+Headless by default, and every context drops the requests a scraper never needs:
+images, media, fonts and third-party trackers. Works with both the sync and the
+async Playwright API. Settings:
+  BROWSER_HEADLESS=1            0 shows the browser window (debugging, manual logins)
+  BROWSER_BLOCK_RESOURCES=image,media,font
+  BROWSER_BLOCK_DOMAINS=        extra tracker domains, comma separated
+"""
+import os
+import time
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+# Analytics, ad and tag-manager hosts; a request is blocked when its host is one of
+# these or a subdomain of one
+TRACKER_DOMAINS = [
+    "doubleclick.net",
+    "google-analytics.com",
+    "googleadservices.com",
+    "googlesyndication.com",
+    "googletagmanager.com",
+    "googletagservices.com",
+    "adservice.google.com",
+    "connect.facebook.net",
+    "hotjar.com",
+    "segment.io",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "criteo.com",
+    "taboola.com",
+    "outbrain.com",
+    "bat.bing.com",
+    "analytics.tiktok.com",
+]
+
+# Flags that cut background work a scraper does not need
+LEAN_ARGS = [
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-extensions",
+    "--disable-sync",
+    "--mute-audio",
+    "--no-first-run",
+]
+
+# A normal laptop viewport - large enough for desktop layouts, cheap to lay out
+VIEWPORT = {"width": 1280, "height": 800}
+
+
+def env_list(name: str, default: str) -> List[str]:
+    return [value.strip().lower() for value in os.getenv(name, default).split(",") if value.strip()]
+
+
+def launch_options(args: List[str] = None, headless: bool = None) -> Dict:
+    """Keyword arguments for playwright.chromium.launch()"""
+    if headless is None:
+        headless = os.getenv("BROWSER_HEADLESS", "1") == "1"
+    return {"headless": headless, "args": LEAN_ARGS + (args or [])}
+
+
+def context_options(**overrides) -> Dict:
+    """Keyword arguments for browser.new_context(); overrides win"""
+    return {"viewport": VIEWPORT, "service_workers": "block", **overrides}
+
+
+class RequestFilter:
+    """Decides which requests a lean context drops, and counts them"""
+
+    def __init__(self, resource_types: List[str] = None, tracker_domains: List[str] = None):
+        self.resource_types = set(resource_types or env_list("BROWSER_BLOCK_RESOURCES", "image,media,font"))
+        self.tracker_domains = tracker_domains or TRACKER_DOMAINS + env_list("BROWSER_BLOCK_DOMAINS", "")
+        self.blocked = 0
+        self.allowed = 0
+
+    def is_tracker(self, url: str) -> bool:
+        host = (urlsplit(url).hostname or "").lower()
+        return any(host == domain or host.endswith("." + domain) for domain in self.tracker_domains)
+
+    def should_block(self, request) -> bool:
+        block = request.resource_type in self.resource_types or self.is_tracker(request.url)
+        if block:
+            self.blocked += 1
+        else:
+            self.allowed += 1
+        return block
+
+    async def route_async(self, route):
+        if self.should_block(route.request):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def route_sync(self, route):
+        if self.should_block(route.request):
+            route.abort()
+        else:
+            route.continue_()
+
+
+async def install_async(context, request_filter: RequestFilter = None) -> RequestFilter:
+    """Start blocking in an async-API browser context"""
+    request_filter = request_filter or RequestFilter()
+    await context.route("**/*", request_filter.route_async)
+    return request_filter
+
+
+def install_sync(context, request_filter: RequestFilter = None) -> RequestFilter:
+    """Start blocking in a sync-API browser context"""
+    request_filter = request_filter or RequestFilter()
+    context.route("**/*", request_filter.route_sync)
+    return request_filter
+
+
+def error_screenshot_path(name: str) -> str:
+    """Where to save the screenshot of a failed step - the only screenshots the scrapers take"""
+    os.makedirs("screenshots", exist_ok=True)
+    safe_name = "".join(char if char.isalnum() or char in "-_" else "_" for char in name)
+    return os.path.join("screenshots", f"error_{safe_name}_{time.strftime('%Y%m%d_%H%M%S')}.png")
@@ -0,0 +1,195 @@
+"""Structured ad records from the Ads Library's own network responses.
+
+The results page loads its ads as JSON (GraphQL, sometimes several JSON documents
+per response, sometimes behind a "for (;;);" guard). Parsing those responses gives
+page ID, page name, ad ID, start date, platforms and link targets for every ad
+without reading the DOM or asking AgentQL.
+Check the parser against a recorded response: python ad_capture.py fixtures/ads_library_graphql_response.txt
+"""
+import asyncio
+import datetime
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from loguru import logger
+
+# Responses that carry search results
+ADS_RESPONSE_PATTERN = re.compile(r"/api/graphql|/ads/library/async/")
+JSON_GUARD = "for (;;);"
+
+
+def parse_json_documents(text: str) -> List:
+    """Every JSON document in a response body - GraphQL streams one per line"""
+    text = text.strip()
+    if text.startswith(JSON_GUARD):
+        text = text[len(JSON_GUARD):]
+    decoder = json.JSONDecoder()
+    documents = []
+    position = 0
+    while position < len(text):
+        if text[position].isspace():
+            position += 1
+            continue
+        try:
+            document, position = decoder.raw_decode(text, position)
+        except ValueError:
+            break
+        documents.append(document)
+    return documents
+
+
+def find_ads(payload) -> Iterator[Dict]:
+    """Walk a payload and yield every object that describes one ad"""
+    if isinstance(payload, dict):
+        if payload.get("ad_archive_id") and payload.get("page_id"):
+            yield payload
+            return
+        for value in payload.values():
+            yield from find_ads(value)
+    elif isinstance(payload, list):
+        for value in payload:
+            yield from find_ads(value)
+
+
+def format_date(timestamp) -> Optional[str]:
+    """Unix timestamp -> YYYY-MM-DD (UTC); None when missing"""
+    if not timestamp:
+        return None
+    return datetime.datetime.fromtimestamp(int(timestamp), datetime.timezone.utc).strftime("%Y-%m-%d")
+
+
+def unwrap_redirect(url: str) -> str:
+    """Target of an l.facebook.com/l.php?u=... redirect; other URLs unchanged"""
+    parts = urlsplit(url)
+    if parts.path == "/l.php":
+        target = parse_qs(parts.query).get("u")
+        if target:
+            return target[0]
+    return url
+
+
+def ad_record(ad: Dict) -> Dict:
+    """The fields we keep from one ad object"""
+    snapshot = ad.get("snapshot") or {}
+    link_targets = []
+    for url in [snapshot.get("link_url")] + [card.get("link_url") for card in snapshot.get("cards") or []]:
+        if url:
+            url = unwrap_redirect(url)
+            if url not in link_targets:
+                link_targets.append(url)
+
+    page_id = str(ad["page_id"])
+    return {
+        "ad_id": str(ad["ad_archive_id"]),
+        "page_id": page_id,
+        "page_name": ad.get("page_name") or snapshot.get("page_name"),
+        "profile_link": snapshot.get("page_profile_uri") or f"https://www.facebook.com/{page_id}",
+        "start_date": format_date(ad.get("start_date")),
+        "platforms": [platform.lower() for platform in ad.get("publisher_platform") or []],
+        "link_targets": link_targets,
+    }
+
+
+def parse_response_body(text: str) -> List[Dict]:
+    """Ad records in one response body, in the order the page received them"""
+    records = []
+    for document in parse_json_documents(text):
+        for ad in find_ads(document):
+            try:
+                records.append(ad_record(ad))
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Skipping malformed ad {ad.get('ad_archive_id')}: {str(e)}")
+    return records
+
+
+class AdRecordWriter:
+    """Appends ad records of all keywords to one JSON Lines file, each ad once"""
+
+    def __init__(self, output_file: str = None):
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        self.output_file = output_file or f"results/ads_{timestamp}.jsonl"
+        os.makedirs(os.path.dirname(self.output_file) or ".", exist_ok=True)
+        self.file = open(self.output_file, 'w', encoding='utf-8')
+        self.ad_ids = set()
+
+    def add(self, records: List[Dict]) -> int:
+        """Write the ads not seen before; returns how many were new"""
+        new_records = 0
+        for record in records:
+            if record["ad_id"] not in self.ad_ids:
+                self.ad_ids.add(record["ad_id"])
+                self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                new_records += 1
+        if new_records:
+            self.file.flush()
+        return new_records
+
+    def close(self):
+        self.file.close()
+        logger.info(f"Saved {len(self.ad_ids)} ad records to {self.output_file}")
+
+
+class AdCapture:
+    """Listens to one page's responses and collects the ads they carry"""
+
+    def __init__(self, page, writer: AdRecordWriter):
+        self.writer = writer
+        self.keyword = None
+        self.pending: List[Dict] = []
+        self.received = 0
+        self.new_records = asyncio.Event()
+        page.on("response", self._on_response)
+
+    def start(self, keyword: str):
+        """Attribute the responses from now on to a new keyword search"""
+        self.keyword = keyword
+        self.pending = []
+        self.received = 0
+        self.new_records.clear()
+
+    async def _on_response(self, response):
+        if self.keyword is None or not ADS_RESPONSE_PATTERN.search(response.url) or not response.ok:
+            return
+        try:
+            records = parse_response_body(await response.text())
+        except Exception as e:
+            # Redirects and closed pages have no body - not an error for the search
+            logger.debug(f"Could not read response {response.url}: {str(e)}")
+            return
+        if not records:
+            return
+        for record in records:
+            record["keyword"] = self.keyword
+        self.writer.add(records)
+        self.pending.extend(records)
+        self.received += len(records)
+        self.new_records.set()
+
+    def take_records(self) -> List[Dict]:
+        """Ad records captured since the last call"""
+        records = self.pending
+        self.pending = []
+        self.new_records.clear()
+        return records
+
+    async def wait_for_more(self, timeout_ms: int) -> bool:
+        """Wait for the next response with ads; False on timeout"""
+        try:
+            await asyncio.wait_for(self.new_records.wait(), timeout_ms / 1000)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        with open(path, encoding='utf-8') as f:
+            records = parse_response_body(f.read())
+        print(f"\n=== {path}: {len(records)} ads ===")
+        for record in records:
+            print(json.dumps(record, ensure_ascii=False))
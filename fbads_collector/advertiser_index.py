@@ -0,0 +1,250 @@
+"""Persistent index of advertisers found across collector runs.
+
+Profile links are canonicalized to one URL per Facebook page, so tracking
+parameters, l.php redirects, mobile hosts and trailing-slash variants all land
+on the same row. Every run is recorded, and each advertiser keeps first/last
+seen per keyword, so consumers can read just the delta:
+  python advertiser_index.py new              advertisers first seen in the last run
+  python advertiser_index.py new --since 12   advertisers first seen after run 12
+  python advertiser_index.py runs
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import sqlite3
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    keywords TEXT NOT NULL,
+    failed_keywords TEXT
+);
+
+CREATE TABLE IF NOT EXISTS advertisers (
+    profile_link TEXT PRIMARY KEY,
+    page_id TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    first_run INTEGER NOT NULL REFERENCES runs(id),
+    last_run INTEGER NOT NULL REFERENCES runs(id)
+);
+
+CREATE TABLE IF NOT EXISTS advertiser_keywords (
+    profile_link TEXT NOT NULL REFERENCES advertisers(profile_link),
+    keyword TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    first_run INTEGER NOT NULL,
+    last_run INTEGER NOT NULL,
+    PRIMARY KEY (profile_link, keyword)
+);
+
+CREATE INDEX IF NOT EXISTS advertisers_first_run ON advertisers(first_run);
+CREATE INDEX IF NOT EXISTS advertisers_page_id ON advertisers(page_id);
+CREATE INDEX IF NOT EXISTS advertiser_keywords_keyword ON advertiser_keywords(keyword, first_run);
+"""
+
+# First path segments that are Facebook features, not pages. Every *.php segment
+# other than profile.php is a feature too (login.php, policy.php, ...)
+NON_PAGE_PATHS = {
+    "about", "ads", "ajax", "bookmarks", "business", "campaign", "checkpoint", "dialog", "events",
+    "friends", "fundraisers", "gaming", "groups", "hashtag", "help", "legal", "live", "login",
+    "marketplace", "media", "messages", "notes", "photo", "photos", "places", "plugins", "policies",
+    "privacy", "recover", "reel", "reels", "search", "settings", "share", "sharer", "stories",
+    "terms", "tr", "videos", "watch",
+}
+# /pages/... and /people/... links name the page by its numeric ID, either as a
+# segment of its own or at the end of the last one (/pages/category/Shopping/Acme-123/)
+PAGE_ID_SEGMENT = re.compile(r"(?:^|-)(\d{5,})$")
+
+
+def canonical_profile_link(url: str) -> Optional[str]:
+    """One stable URL per Facebook page; None for links that are not a page
+
+    https://m.facebook.com/AcmeRunning/?ref=ads -> https://www.facebook.com/acmerunning
+    https://www.facebook.com/profile.php?id=123&ref=x -> https://www.facebook.com/123
+    https://www.facebook.com/pages/Acme/123456 -> https://www.facebook.com/123456
+    https://www.facebook.com/pg/Acme/about -> https://www.facebook.com/acme
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host == "l.facebook.com" or parts.path == "/l.php":
+        target = parse_qs(parts.query).get("u")
+        return canonical_profile_link(target[0]) if target else None
+    if not (host == "facebook.com" or host.endswith(".facebook.com")):
+        return None
+
+    segments = [unquote(segment) for segment in parts.path.split("/") if segment]
+    if not segments:
+        return None
+    first = segments[0].lower()
+    if first == "profile.php":
+        page = parse_qs(parts.query).get("id", [None])[0]
+    elif first in ("pages", "people"):
+        # Without an ID these are directory or name-only links, not a page identity
+        page = None
+        for segment in reversed(segments[1:]):
+            match = PAGE_ID_SEGMENT.search(segment)
+            if match:
+                page = match.group(1)
+                break
+    elif first == "pg":
+        page = segments[1].lower() if len(segments) >= 2 else None
+    elif first in NON_PAGE_PATHS or first.endswith(".php"):
+        page = None
+    else:
+        # Vanity names are case-insensitive; /acme/posts/... is still the acme page
+        page = first
+    return f"https://www.facebook.com/{page}" if page else None
+
+
+def page_id(profile_link: str) -> Optional[str]:
+    """Numeric page ID when the canonical link is ID-based"""
+    name = profile_link.rsplit("/", 1)[1]
+    return name if name.isdigit() else None
+
+
+class AdvertiserIndex:
+    """SQLite index of canonical advertiser pages, with first/last seen per keyword and run"""
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or os.getenv("FB_ADS_INDEX_PATH", os.path.join("results", "advertisers.db"))
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    self.conn.execute(statement)
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    def start_run(self, keywords: List[str]) -> int:
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            cursor = self.conn.execute(
+                "INSERT INTO runs (started_at, keywords) VALUES (?, ?)",
+                (self._now(), json.dumps(keywords, ensure_ascii=False))
+            )
+        return cursor.lastrowid
+
+    def finish_run(self, run_id: int, failed_keywords: List[str] = None):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE runs SET finished_at = ?, failed_keywords = ? WHERE id = ?",
+                (self._now(), json.dumps(failed_keywords or [], ensure_ascii=False), run_id)
+            )
+
+    def _resolve(self, profile_link: str, known_page_id: Optional[str]) -> str:
+        """The row a page is stored under: the first row that has its page ID, else its own link"""
+        if known_page_id:
+            row = self.conn.execute(
+                "SELECT profile_link FROM advertisers WHERE page_id = ? ORDER BY first_run, profile_link LIMIT 1",
+                (known_page_id,)
+            ).fetchone()
+            if row:
+                return row[0]
+        return profile_link
+
+    def add_links(self, run_id: int, keyword: str, links: List[str], page_ids: Dict[str, str] = None) -> int:
+        """Upsert a batch of profile links found for a keyword in one transaction; returns how many pages were new
+
+        page_ids maps a canonical link to its numeric page ID when the caller knows it
+        (network capture). Rows are then merged on the ID, so the vanity link and the
+        /<page_id> link of one page stay one advertiser.
+        """
+        page_ids = page_ids or {}
+        now = self._now()
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            pages = {}
+            for link in links:
+                link = canonical_profile_link(link)
+                if not link:
+                    continue
+                known_page_id = page_ids.get(link) or page_id(link)
+                key = self._resolve(link, known_page_id)
+                pages[key] = pages.get(key) or known_page_id
+            if not pages:
+                return 0
+            known = self.conn.execute(
+                f"SELECT COUNT(*) FROM advertisers WHERE profile_link IN ({','.join('?' * len(pages))})", list(pages)
+            ).fetchone()[0]
+            self.conn.executemany(
+                """INSERT INTO advertisers (profile_link, page_id, first_seen, last_seen, first_run, last_run)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(profile_link) DO UPDATE SET last_seen = excluded.last_seen, last_run = excluded.last_run,
+                       page_id = COALESCE(advertisers.page_id, excluded.page_id)""",
+                [(page, known_page_id, now, now, run_id, run_id) for page, known_page_id in pages.items()]
+            )
+            self.conn.executemany(
+                """INSERT INTO advertiser_keywords (profile_link, keyword, first_seen, last_seen, first_run, last_run)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(profile_link, keyword) DO UPDATE SET last_seen = excluded.last_seen, last_run = excluded.last_run""",
+                [(page, keyword, now, now, run_id, run_id) for page in pages]
+            )
+        return len(pages) - known
+
+    def last_run_id(self) -> Optional[int]:
+        """The most recent finished run"""
+        row = self.conn.execute("SELECT MAX(id) FROM runs WHERE finished_at IS NOT NULL").fetchone()
+        return row[0]
+
+    def new_advertisers(self, since_run: int = None) -> List[Dict]:
+        """Advertisers first seen after since_run - by default those first seen in the last finished run"""
+        if since_run is None:
+            last_run = self.last_run_id()
+            if last_run is None:
+                return []
+            since_run = last_run - 1
+        rows = self.conn.execute(
+            """SELECT a.profile_link, a.page_id, a.first_seen, a.first_run,
+                      GROUP_CONCAT(k.keyword, '|') AS keywords
+               FROM advertisers a JOIN advertiser_keywords k ON k.profile_link = a.profile_link
+               WHERE a.first_run > ?
+               GROUP BY a.profile_link
+               ORDER BY a.first_run, a.first_seen, a.profile_link""",
+            (since_run,)
+        ).fetchall()
+        return [{**dict(row), "keywords": row["keywords"].split("|")} for row in rows]
+
+    def runs(self, limit: int = 20) -> List[Dict]:
+        rows = self.conn.execute(
+            """SELECT r.id, r.started_at, r.finished_at, r.keywords, r.failed_keywords,
+                      (SELECT COUNT(*) FROM advertisers a WHERE a.first_run = r.id) AS new_advertisers,
+                      (SELECT COUNT(*) FROM advertisers a WHERE a.last_run = r.id) AS seen_advertisers
+               FROM runs r ORDER BY r.id DESC LIMIT ?""",
+            (limit,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read the advertiser index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    new_parser = subparsers.add_parser("new", help="Advertisers first seen since a run, one JSON object per line")
+    new_parser.add_argument("--since", type=int, default=None, help="Run ID already consumed (default: all but the last run)")
+    subparsers.add_parser("runs", help="Recent runs with their new and seen advertiser counts")
+    args = parser.parse_args()
+
+    index = AdvertiserIndex()
+    if args.command == "new":
+        for advertiser in index.new_advertisers(args.since):
+            print(json.dumps(advertiser, ensure_ascii=False))
+    else:
+        for run in index.runs():
+            print(json.dumps(run, ensure_ascii=False))
+    index.close()
@@ -0,0 +1,177 @@
+"""Benchmark fixed sleeps against condition-based waits on a local replica of the Ads Library page.
+
+Drives the same steps as FacebookAdsCollector.search_ads_library (country picker,
+category dropdown, keyword search, results) with plain Playwright selectors, since
+the replica is local and needs no AgentQL. With --workers N it also times the
+condition-based flow over a pool of N browser contexts, like the collector's workers,
+and it always times the deep-link fast path that skips the pickers and the
+infinite-scroll extraction that keeps loading results past the first screen.
+Run: python bench_waits.py --keywords 6 --workers 3
+"""
+import argparse
+import asyncio
+import functools
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+
+from playwright.async_api import async_playwright
+
+from main import (RESULT_LINK_SELECTOR, UNREAD_LINK_SELECTOR, build_search_url, read_new_links, scroll_to_bottom,
+                  wait_for_network_quiet, wait_for_stable_count, wait_for_state)
+
+BENCH_DIR = Path(__file__).parent / "bench"
+
+# The pauses search_ads_library used to make, in order (seconds)
+FIXED_SLEEPS = {
+    "load page": [3],
+    "select country": [2, 2, 2],
+    "select ad category": [2, 1, 2],
+    "search": [1, 5],
+    "extract links": [5],
+}
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_replica() -> ThreadingHTTPServer:
+    """Serve the bench directory on a free local port"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=str(BENCH_DIR)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run_keyword(page, url: str, keyword: str, mode: str) -> Dict[str, float]:
+    """One keyword search; returns seconds per step"""
+    timings = {}
+
+    async def step(name: str, action, wait):
+        start = time.perf_counter()
+        await action()
+        if mode == "sleeps":
+            for seconds in FIXED_SLEEPS[name]:
+                await asyncio.sleep(seconds)
+        else:
+            await wait()
+        timings[name] = time.perf_counter() - start
+
+    async def select_country():
+        await page.click("#country-button")
+        if mode != "sleeps":
+            # The sleeps baseline only has its fixed pauses, like the old flow
+            await wait_for_state(page.get_by_placeholder("Search for country"), "visible", 15000)
+        await page.fill("#country-input", "United States")
+        await page.get_by_text("United States", exact=True).first.click()
+
+    async def select_category():
+        await page.click("#category-button")
+        await page.get_by_text("All ads").first.click()
+
+    async def search():
+        await page.fill("#search", keyword)
+        await page.keyboard.press("Enter")
+
+    async def nothing():
+        pass
+
+    if mode == "deeplink":
+        await step("deep link", lambda: page.goto(build_search_url(url, keyword)),
+                   lambda: wait_for_stable_count(page, RESULT_LINK_SELECTOR, 1500, 15000))
+        timings["links"] = await page.locator(RESULT_LINK_SELECTOR).count()
+        return timings
+
+    if mode == "scroll":
+        await step("deep link", lambda: page.goto(build_search_url(url, keyword)),
+                   lambda: wait_for_stable_count(page, RESULT_LINK_SELECTOR, 1500, 15000))
+        links = 0
+
+        async def read_all():
+            nonlocal links
+            links = len(await read_new_links(page))
+            while True:
+                await scroll_to_bottom(page)
+                if not await wait_for_stable_count(page, UNREAD_LINK_SELECTOR, 1500, 5000):
+                    return
+                links += len(await read_new_links(page))
+
+        await step("scroll", read_all, nothing)
+        timings["links"] = links
+        return timings
+
+    await step("load page", lambda: page.goto(url), lambda: wait_for_network_quiet(page, 5000))
+    await step("select country", select_country,
+               lambda: wait_for_state(page.get_by_placeholder("Search for country"), "hidden", 15000))
+    await step("select ad category", select_category,
+               lambda: wait_for_state(page.locator("#category-menu"), "hidden", 15000))
+    await step("search", search, lambda: wait_for_network_quiet(page, 5000))
+    await step("extract links", nothing, lambda: wait_for_stable_count(page, RESULT_LINK_SELECTOR, 1500, 15000))
+    timings["links"] = await page.locator(RESULT_LINK_SELECTOR).count()
+    return timings
+
+
+async def run(mode: str, keywords: List[str], url: str, workers: int = 1) -> List[Dict[str, float]]:
+    """Search every keyword, spread over a pool of browser contexts sharing one browser"""
+    queue = asyncio.Queue()
+    for keyword in keywords:
+        queue.put_nowait(keyword)
+    results = []
+
+    async def worker(browser):
+        context = await browser.new_context()
+        page = await context.new_page()
+        while not queue.empty():
+            results.append(await run_keyword(page, url, queue.get_nowait(), mode))
+        await context.close()
+
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=True)
+        await asyncio.gather(*[worker(browser) for _ in range(workers)])
+        await browser.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fixed sleeps vs condition-based waits per keyword")
+    parser.add_argument("--keywords", type=int, default=3, help="Keywords to search per mode")
+    parser.add_argument("--workers", type=int, default=1, help="Also time a pool of this many browser contexts")
+    args = parser.parse_args()
+
+    server = serve_replica()
+    url = f"http://127.0.0.1:{server.server_port}/ads_library_replica.html"
+    keywords = [f"keyword {i}" for i in range(args.keywords)]
+
+    totals = {}
+    for mode in ("sleeps", "waits"):
+        results = asyncio.run(run(mode, keywords, url))
+        totals[mode] = sum(sum(v for k, v in r.items() if k != "links") for r in results) / len(results)
+        print(f"\n=== {mode} ===")
+        for step_name in FIXED_SLEEPS:
+            mean = sum(r[step_name] for r in results) / len(results)
+            print(f"  {step_name:<20} {mean:6.2f}s")
+        print(f"  {'links found':<20} {results[0]['links']:>6}")
+        print(f"  {'per keyword':<20} {totals[mode]:6.2f}s")
+
+    print(f"\nSaved per keyword: {totals['sleeps'] - totals['waits']:.2f}s "
+          f"({(1 - totals['waits'] / totals['sleeps']) * 100:.0f}%)")
+
+    results = asyncio.run(run("deeplink", keywords, url))
+    deep_link = sum(r["deep link"] for r in results) / len(results)
+    deep_link_links = results[0]["links"]
+    print(f"Deep link per keyword: {deep_link:.2f}s ({results[0]['links']} links, no picker steps)")
+
+    results = asyncio.run(run("scroll", keywords, url))
+    scroll = sum(r["scroll"] for r in results) / len(results)
+    print(f"Infinite scroll per keyword: {scroll:.2f}s ({results[0]['links']} links vs {deep_link_links} on the first screen)")
+
+    if args.workers > 1:
+        for workers in (1, args.workers):
+            start = time.perf_counter()
+            asyncio.run(run("waits", keywords, url, workers))
+            print(f"{len(keywords)} keywords with {workers} worker(s): {time.perf_counter() - start:.2f}s")
+
+    server.shutdown()
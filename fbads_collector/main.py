@@ -1,14 +1,24 @@
 import agentql
-from playwright.sync_api import sync_playwright
+import asyncio
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 from loguru import logger
 from pathlib import Path
+from contextlib import contextmanager
 import os
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field, field_validator
-from typing import List
+from typing import Dict, List, Optional
 import re
+import sys
 import time
-from urllib.parse import unquote
+from urllib.parse import unquote, urlencode, urlsplit, urlunsplit, parse_qsl
+from selector_cache import SelectorCache
+from ad_capture import AdCapture, AdRecordWriter
+from advertiser_index import AdvertiserIndex, canonical_profile_link
+
+# The lean browser profile is shared with the other scrapers in this repo
+sys.path.append(str(Path(__file__).resolve().parent.parent / "browser_profile"))
+from lean_browser import RequestFilter, context_options, error_screenshot_path, install_async, launch_options
 
 # Configure logging
 logger.add(
@@ -18,6 +28,97 @@ logger.add(
     level="INFO"
 )
 
+# Links in the search results - their count settling means the results finished loading
+RESULT_LINK_SELECTOR = "a[href*='facebook.com']"
+# Result links not read yet - each extraction pass marks the links it has read
+UNREAD_LINK_SELECTOR = f"{RESULT_LINK_SELECTOR}:not([data-fbads-read])"
+READ_NEW_LINKS_JS = """
+(links) => links.map(a => { a.setAttribute('data-fbads-read', ''); return a.href; })
+"""
+
+async def wait_for_network_quiet(page, timeout_ms: int) -> bool:
+    """Wait until the page has had no network traffic for 500 ms; False on timeout"""
+    try:
+        await page.wait_for_load_state("networkidle", timeout=timeout_ms)
+        return True
+    except PlaywrightTimeoutError:
+        # Pages with long polling never go fully quiet - carry on with what is loaded
+        logger.warning(f"Network did not go quiet within {timeout_ms} ms")
+        return False
+
+async def wait_for_state(locator, state: str, timeout_ms: int) -> bool:
+    """Wait for the first element of a locator to become visible/hidden; False on timeout"""
+    try:
+        await locator.first.wait_for(state=state, timeout=timeout_ms)
+        return True
+    except PlaywrightTimeoutError:
+        logger.warning(f"Element did not become {state} within {timeout_ms} ms")
+        return False
+
+async def wait_for_stable_count(page, selector: str, stable_ms: int, timeout_ms: int, poll_ms: int = 250) -> int:
+    """Wait until the number of elements matching selector is non-zero and stops changing
+
+    Returns the last count seen, also when the timeout is hit first.
+    """
+    deadline = time.monotonic() + timeout_ms / 1000
+    last_count = -1
+    stable_since = time.monotonic()
+    while True:
+        count = await page.locator(selector).count()
+        now = time.monotonic()
+        if count != last_count:
+            last_count, stable_since = count, now
+        elif count > 0 and (now - stable_since) * 1000 >= stable_ms:
+            return count
+        if now >= deadline:
+            logger.warning(f"Result count still changing after {timeout_ms} ms ({count} elements)")
+            return count
+        await page.wait_for_timeout(poll_ms)
+
+async def read_new_links(page) -> List[str]:
+    """hrefs of result links rendered since the last call"""
+    return await page.locator(UNREAD_LINK_SELECTOR).evaluate_all(READ_NEW_LINKS_JS)
+
+async def scroll_to_bottom(page):
+    """Scroll to the end of the results so the page loads the next batch of ads"""
+    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+
+def clean_profile_link(href: str) -> Optional[str]:
+    """Unwrap l.php redirects; the page's canonical link, or None unless it is a Facebook page outside the Ads Library"""
+    # Clean up redirect URL if needed
+    if "l.php?u=" in href:
+        href = unquote(href.split('u=')[1].split('&')[0])
+    
+    # Only keep Facebook profile links
+    if "facebook.com" in href and "/ads/library" not in href:
+        return canonical_profile_link(href)
+    return None
+
+async def count_profile_links(page) -> int:
+    """Distinct advertiser pages among the result links - nav, footer and help links do not count"""
+    hrefs = await page.locator(RESULT_LINK_SELECTOR).evaluate_all("(links) => links.map(a => a.href)")
+    return len({link for link in map(clean_profile_link, hrefs) if link})
+
+def build_search_url(base_url: str, query: str, country: str = "US", ad_category: str = "all",
+                     media_type: str = "all", active_status: str = "active") -> str:
+    """Ads Library URL that opens the results for a query directly, skipping the pickers
+
+    ad_category is the Ads Library ad_type (all, political_and_issue_ads, housing_ads,
+    employment_ads, credit_ads); media_type is all, image, video, meme or none.
+    Parameters already in base_url are kept unless overridden here.
+    """
+    parts = urlsplit(base_url or "https://www.facebook.com/ads/library/")
+    params = dict(parse_qsl(parts.query))
+    params.update({
+        "active_status": active_status,
+        "ad_type": ad_category,
+        "country": country,
+        "media_type": media_type,
+        "q": query,
+        "search_type": "keyword_unordered",
+    })
+    return urlunsplit((parts.scheme, parts.netloc, parts.path or "/", urlencode(params), ""))
+
 class SearchParameters(BaseModel):
     """Pydantic model for validating search parameters"""
     keywords: List[str] = Field(..., min_items=1, max_items=5)
@@ -33,11 +134,80 @@ class SearchParameters(BaseModel):
                 raise ValueError(f"Keyword '{keyword}' contains invalid characters")
         return keywords
 
+class ProfileLinkWriter:
+    """Appends deduplicated profile links to one results file as they are found"""
+    
+    def __init__(self, output_file: str = None):
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        self.output_file = output_file or f"results/profile_links_{timestamp}.txt"
+        os.makedirs(os.path.dirname(self.output_file) or ".", exist_ok=True)
+        self.file = open(self.output_file, 'w', encoding='utf-8')
+        self.links = set()
+    
+    def add(self, links: List[str]) -> int:
+        """Write the links not seen before; returns how many were new"""
+        new_links = 0
+        for link in links:
+            if link not in self.links:
+                self.links.add(link)
+                self.file.write(f"{link}\n")
+                new_links += 1
+        if new_links:
+            # Flush every pass so an interrupted run keeps what it found
+            self.file.flush()
+        return new_links
+    
+    def close(self):
+        self.file.close()
+        logger.info(f"Saved {len(self.links)} unique profile links to {self.output_file}")
+
 class FacebookAdsCollector:
     def __init__(self):
         """Initialize the Facebook Ads Collector"""
         self.search_params = None
         self.base_url = os.getenv('FB_ADS_LIBRARY_URL')
+        # Upper bounds for the condition-based waits (milliseconds)
+        self.wait_timeout = int(os.getenv('FB_ADS_WAIT_TIMEOUT_MS', '15000'))
+        self.network_quiet_timeout = int(os.getenv('FB_ADS_NETWORK_QUIET_TIMEOUT_MS', '5000'))
+        self.results_stable_ms = int(os.getenv('FB_ADS_RESULTS_STABLE_MS', '1500'))
+        self.step_timings: List[Dict] = []
+        # Keywords searched at the same time, each in its own browser context
+        self.workers = int(os.getenv('FB_ADS_WORKERS', '3'))
+        self.failed_keywords: Dict[str, str] = {}
+        # Deep-link search settings - the UI flow is only used when the deep link shows no results
+        self.use_deep_link = os.getenv('FB_ADS_DEEP_LINK', '1') == '1'
+        self.country = os.getenv('FB_ADS_COUNTRY', 'US')
+        self.ad_category = os.getenv('FB_ADS_AD_CATEGORY', 'all')
+        self.media_type = os.getenv('FB_ADS_MEDIA_TYPE', 'all')
+        self.active_status = os.getenv('FB_ADS_ACTIVE_STATUS', 'active')
+        self.deep_link_timeout = int(os.getenv('FB_ADS_DEEP_LINK_TIMEOUT_MS', '8000'))
+        # AgentQL lookups resolved once per page template, then replayed as plain selectors
+        self.selector_cache = SelectorCache()
+        # Infinite-scroll limits per keyword: scroll passes, profile links (0 = no limit)
+        # and how long to wait for another batch of ads after scrolling (ms)
+        self.max_scrolls = int(os.getenv('FB_ADS_MAX_SCROLLS', '50'))
+        self.max_links = int(os.getenv('FB_ADS_MAX_LINKS', '0'))
+        self.scroll_timeout = int(os.getenv('FB_ADS_SCROLL_TIMEOUT_MS', '5000'))
+        self.link_writer = None
+        # Read ads from the page's own JSON responses; DOM links are the fallback
+        self.capture_network = os.getenv('FB_ADS_CAPTURE', '1') == '1'
+        self.ad_writer = None
+        # Drops images, media, fonts and trackers in every worker's context
+        self.request_filter = RequestFilter()
+        # Advertisers across runs; run_id is set while a search is running
+        self.index = None
+        self.run_id = None
+        
+    @contextmanager
+    def step(self, keyword: str, name: str):
+        """Time one step of a keyword search and log how long it took"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.step_timings.append({"keyword": keyword, "step": name, "seconds": round(elapsed, 3)})
+            logger.info(f"[{keyword}] {name}: {elapsed:.2f}s")
         
     def get_user_input(self) -> SearchParameters:
         """Get and validate search keywords from user input"""
@@ -65,15 +235,29 @@ class FacebookAdsCollector:
             logger.error(f"Unexpected error during input: {str(e)}")
             raise
 
-    def extract_profile_links(self, page) -> List[str]:
-        """Extract profile links from search results"""
+    async def extract_profile_links(self, page, keyword: str, wait_for_results: bool = True,
+                                    capture: AdCapture = None) -> int:
+        """Scroll through the search results, streaming new profile links to the results file
+
+        Each pass reads only the ads loaded since the previous pass, then scrolls
+        for more. Stops when no new ads load or a limit is hit; returns the number of
+        profile links found for this keyword. When the capture has seen the page's
+        own ad responses, links come from those and the DOM is not read at all.
+        """
         try:
             logger.info("Extracting profile links from search results...")
             
-            # Wait for results to load
-            time.sleep(5)
+            # Wait until the results stop growing instead of a fixed pause
+            if wait_for_results and not (capture and capture.received):
+                count = await wait_for_stable_count(page, RESULT_LINK_SELECTOR, self.results_stable_ms, self.wait_timeout)
+                logger.info(f"Results settled with {count} links")
+            
+            use_capture = capture is not None and capture.received > 0
+            if use_capture:
+                logger.info(f"[{keyword}] Reading {capture.received} ads captured from network responses")
             
-            # Fixed query syntax - removed attributes nesting
+            # The query already names its selector, so links are read directly and
+            # AgentQL is only asked when the first pass finds nothing
             ALL_LINKS_QUERY = """
             {
                 links(selector: "a[href*='facebook.com']") {
@@ -83,166 +267,318 @@ class FacebookAdsCollector:
             }
             """
             
-            profile_links = set()
-            response = page.query_elements(ALL_LINKS_QUERY)
+            hrefs, page_ids = self.take_captured(capture) if use_capture else (await read_new_links(page), {})
+            if not hrefs:
+                self.selector_cache.ai_calls += 1
+                response = await page.query_elements(ALL_LINKS_QUERY)
+                
+                # Updated response handling to match new query structure
+                if hasattr(response, 'links') and response.links:
+                    hrefs = [link.href for link in response.links]  # Directly access href instead of attributes.href
+                else:
+                    logger.warning("No links found in the response")
             
-            # Updated response handling to match new query structure
-            if hasattr(response, 'links') and response.links:
-                for link in response.links:
+            # Only this keyword's links are kept in memory; the writer dedupes across keywords
+            keyword_links = set()
+            scrolls = 0
+            while True:
+                profile_links = []
+                for href in hrefs:
+                    if self.max_links and len(keyword_links) >= self.max_links:
+                        break
                     try:
-                        href = link.href  # Directly access href instead of attributes.href
                         if href and isinstance(href, str):
-                            # Clean up redirect URL if needed
-                            if "l.php?u=" in href:
-                                clean_url = unquote(href.split('u=')[1].split('&')[0])
-                                href = clean_url
-                            
-                            # Only keep Facebook profile links
-                            if "facebook.com" in href and "/ads/library" not in href:
-                                logger.info(f"Found company URL: {href}")
-                                profile_links.add(href)
+                            href = clean_profile_link(href)
+                            if href and href not in keyword_links:
+                                keyword_links.add(href)
+                                profile_links.append(href)
                     except Exception as e:
                         logger.error(f"Error processing link: {str(e)}")
                         continue
-            else:
-                logger.warning("No links found in the response")
-            
-            # Save links to file
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            output_file = f"results/profile_links_{timestamp}.txt"
-            os.makedirs("results", exist_ok=True)
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                for link in sorted(profile_links):
-                    f.write(f"{link}\n")
+                new_links = self.link_writer.add(profile_links)
+                new_advertisers = self.index.add_links(self.run_id, keyword, profile_links, page_ids)
+                logger.info(f"[{keyword}] pass {scrolls}: {len(hrefs)} new results, {new_links} new profile links, "
+                            f"{new_advertisers} never indexed before")
+                
+                if self.max_links and len(keyword_links) >= self.max_links:
+                    logger.info(f"[{keyword}] Reached the limit of {self.max_links} profile links")
+                    break
+                if scrolls >= self.max_scrolls:
+                    logger.info(f"[{keyword}] Reached the limit of {self.max_scrolls} scroll passes")
+                    break
+                
+                await scroll_to_bottom(page)
+                scrolls += 1
+                if use_capture:
+                    loaded = await capture.wait_for_more(self.scroll_timeout)
+                else:
+                    loaded = await wait_for_stable_count(page, UNREAD_LINK_SELECTOR, self.results_stable_ms, self.scroll_timeout)
+                if not loaded:
+                    logger.info(f"[{keyword}] No more ads loaded after {scrolls} scroll passes")
+                    break
+                hrefs, page_ids = self.take_captured(capture) if use_capture else (await read_new_links(page), {})
             
-            logger.info(f"Saved {len(profile_links)} unique profile links to {output_file}")
-            return list(profile_links)
+            return len(keyword_links)
             
         except Exception as e:
             logger.error(f"Error extracting profile links: {str(e)}")
-            page.screenshot(path=f"error_extraction_{time.strftime('%Y%m%d_%H%M%S')}.png")
+            await page.screenshot(path=error_screenshot_path(f"extraction_{keyword}"))
             raise
 
-    def search_ads_library(self, page) -> None:
-        """Search Facebook Ads Library using AgentQL"""
-        try:
-            for keyword in self.search_params.keywords:
-                logger.info(f"Searching for keyword: {keyword}")
-                
-                # Navigate to Facebook Ads Library
-                page.goto(self.base_url)
-                logger.info("Waiting for page to load completely...")
-                page.wait_for_load_state("networkidle")
-                time.sleep(3)
+    @staticmethod
+    def take_captured(capture: AdCapture):
+        """Profile links of the newly captured ads, and the page ID behind each canonical link"""
+        records = capture.take_records()
+        page_ids = {}
+        for record in records:
+            link = clean_profile_link(record["profile_link"])
+            if link:
+                page_ids[link] = record["page_id"]
+        return [record["profile_link"] for record in records], page_ids
+
+    async def search_keyword(self, page, keyword: str, capture: AdCapture = None) -> int:
+        """Search Facebook Ads Library for one keyword - deep link first, the UI flow as fallback"""
+        logger.info(f"Searching for keyword: {keyword}")
+        keyword_start = time.perf_counter()
+        profile_links = 0
+        if capture:
+            capture.start(keyword)
+        
+        settled = await self.search_via_deep_link(page, keyword, capture)
+        searched = settled
+        if not searched:
+            searched = await self.search_via_ui(page, keyword)
+        
+        if searched:
+            # Extract profile links
+            with self.step(keyword, "extract links"):
+                profile_links = await self.extract_profile_links(page, keyword, wait_for_results=not settled, capture=capture)
+            logger.info(f"Found {profile_links} unique profile links for keyword: {keyword}")
+        
+        logger.info(f"[{keyword}] total: {time.perf_counter() - keyword_start:.2f}s")
+        return profile_links
+
+    async def search_via_deep_link(self, page, keyword: str, capture: AdCapture = None) -> bool:
+        """Open the results with country, category and query encoded in the URL; True if results showed up
+
+        Results means advertiser profile links or captured ads - the page's own
+        facebook.com links (logo, login, footer) are there even when nothing matched.
+        """
+        if not self.use_deep_link:
+            return False
+        
+        url = build_search_url(self.base_url, keyword, self.country, self.ad_category, self.media_type, self.active_status)
+        with self.step(keyword, "deep link"):
+            await page.goto(url)
+            await wait_for_network_quiet(page, self.network_quiet_timeout)
+            await wait_for_stable_count(page, RESULT_LINK_SELECTOR, self.results_stable_ms, self.deep_link_timeout)
+        
+        profile_links = await count_profile_links(page)
+        captured_ads = capture.received if capture else 0
+        if not profile_links and not captured_ads:
+            logger.info(f"Deep link showed no results for '{keyword}', falling back to the UI flow")
+            return False
+        logger.info(f"Deep link showed {profile_links} profile links and {captured_ads} captured ads for '{keyword}'")
+        return True
+
+    async def search_via_ui(self, page, keyword: str) -> bool:
+        """Pick country and ad category in the page UI and type the keyword; True if the search was submitted"""
+        # Navigate to Facebook Ads Library
+        with self.step(keyword, "load page"):
+            await page.goto(self.base_url)
+            logger.info("Waiting for page to load completely...")
+            await wait_for_network_quiet(page, self.network_quiet_timeout)
+        
+        # Handle country selection
+        logger.info("Setting country to United States...")
+        COUNTRY_QUERY = """
+        {
+            country_search(input field to search for country or button to open country selection)
+        }
+        """
+        
+        with self.step(keyword, "select country"):
+            response = await self.selector_cache.query_elements(page, COUNTRY_QUERY)
+            if response.country_search:
+                # Click to open country selection
+                await response.country_search.click()
+                country_input = page.get_by_placeholder("Search for country")
+                await wait_for_state(country_input, "visible", self.wait_timeout)
                 
-                # Handle country selection
-                logger.info("Setting country to United States...")
-                COUNTRY_QUERY = """
+                # Look for the search input
+                SEARCH_COUNTRY_QUERY = """
                 {
-                    country_search(input field to search for country or button to open country selection)
+                    search_input(input field with placeholder "Search for country")
                 }
                 """
                 
-                response = page.query_elements(COUNTRY_QUERY)
-                if response.country_search:
-                    # Click to open country selection
-                    response.country_search.click()
-                    time.sleep(2)
+                search_response = await self.selector_cache.query_elements(page, SEARCH_COUNTRY_QUERY)
+                if search_response.search_input:
+                    await search_response.search_input.fill("United States")
+                    await wait_for_state(page.get_by_text("United States", exact=True), "visible", self.wait_timeout)
                     
-                    # Look for the search input
-                    SEARCH_COUNTRY_QUERY = """
+                    # Click United States option
+                    US_OPTION_QUERY = """
                     {
-                        search_input(input field with placeholder "Search for country")
+                        us_option(clickable element containing exact text "United States")
                     }
                     """
                     
-                    search_response = page.query_elements(SEARCH_COUNTRY_QUERY)
-                    if search_response.search_input:
-                        search_response.search_input.fill("United States")
-                        time.sleep(2)
-                        
-                        # Click United States option
-                        US_OPTION_QUERY = """
-                        {
-                            us_option(clickable element containing exact text "United States")
-                        }
-                        """
-                        
-                        us_response = page.query_elements(US_OPTION_QUERY)
-                        if us_response.us_option:
-                            us_response.us_option.click()
-                            time.sleep(2)
+                    us_response = await self.selector_cache.query_elements(page, US_OPTION_QUERY)
+                    if us_response.us_option:
+                        await us_response.us_option.click()
+                        # The picker closes once the choice is applied
+                        await wait_for_state(country_input, "hidden", self.wait_timeout)
+        
+        # Handle ad category selection
+        logger.info("Setting ad category...")
+        AD_CATEGORY_QUERY = """
+        {
+            category_button(button with text "Ad category" or button to select ad category)
+        }
+        """
+        
+        with self.step(keyword, "select ad category"):
+            category_response = await self.selector_cache.query_elements(page, AD_CATEGORY_QUERY)
+            if category_response.category_button:
+                await category_response.category_button.click()
+                await wait_for_state(page.get_by_text("All ads"), "visible", self.wait_timeout)
                 
-                # Handle ad category selection
-                logger.info("Setting ad category...")
-                AD_CATEGORY_QUERY = """
+                # First clear any existing selection
+                CLEAR_CATEGORY_QUERY = """
                 {
-                    category_button(button with text "Ad category" or button to select ad category)
+                    clear_button(button to clear or remove current category selection)
                 }
                 """
+                try:
+                    clear_response = await self.selector_cache.query_elements(page, CLEAR_CATEGORY_QUERY)
+                    if clear_response.clear_button:
+                        await clear_response.clear_button.click()
+                        await wait_for_network_quiet(page, self.network_quiet_timeout)
+                except:
+                    pass
                 
-                category_response = page.query_elements(AD_CATEGORY_QUERY)
-                if category_response.category_button:
-                    category_response.category_button.click()
-                    time.sleep(2)
-                    
-                    # First clear any existing selection
-                    CLEAR_CATEGORY_QUERY = """
-                    {
-                        clear_button(button to clear or remove current category selection)
-                    }
-                    """
-                    try:
-                        clear_response = page.query_elements(CLEAR_CATEGORY_QUERY)
-                        if clear_response.clear_button:
-                            clear_response.clear_button.click()
-                            time.sleep(1)
-                    except:
-                        pass
-                    
-                    # Select "All ads" option with more specific query
-                    ALL_ADS_QUERY = """
-                    {
-                        all_ads_option(element with text "All Ads" in the category dropdown menu)
-                    }
-                    """
-                    
-                    all_ads_response = page.query_elements(ALL_ADS_QUERY)
-                    if all_ads_response.all_ads_option:
-                        all_ads_response.all_ads_option.click()
-                        time.sleep(2)
-                
-                # Handle search input
-                logger.info(f"Searching for keyword: {keyword}")
-                SEARCH_QUERY = """
+                # Select "All ads" option with more specific query
+                ALL_ADS_QUERY = """
                 {
-                    search_input(input field for searching ads or input with placeholder containing "search")
+                    all_ads_option(element with text "All Ads" in the category dropdown menu)
                 }
                 """
                 
-                search_response = page.query_elements(SEARCH_QUERY)
-                if search_response.search_input:
-                    search_response.search_input.fill(keyword)
-                    time.sleep(1)
-                    page.keyboard.press("Enter")
-                    logger.info(f"Entered search term: {keyword}")
-                    
-                    # Wait for results to load
-                    time.sleep(5)
-                    
-                    # Extract profile links
-                    profile_links = self.extract_profile_links(page)
-                    logger.info(f"Found {len(profile_links)} unique profile links for keyword: {keyword}")
-                    
-                    # Save screenshot for debugging
-                    page.screenshot(path=f"search_results_{keyword.replace(' ', '_')}.png")
-                    logger.info(f"Saved screenshot for: {keyword}")
+                all_ads_response = await self.selector_cache.query_elements(page, ALL_ADS_QUERY)
+                if all_ads_response.all_ads_option:
+                    await all_ads_response.all_ads_option.click()
+                    await wait_for_network_quiet(page, self.network_quiet_timeout)
+        
+        # Handle search input
+        logger.info(f"Searching for keyword: {keyword}")
+        SEARCH_QUERY = """
+        {
+            search_input(input field for searching ads or input with placeholder containing "search")
+        }
+        """
+        
+        with self.step(keyword, "search"):
+            search_response = await self.selector_cache.query_elements(page, SEARCH_QUERY)
+            searched = bool(search_response.search_input)
+            if searched:
+                await search_response.search_input.fill(keyword)
+                await page.keyboard.press("Enter")
+                logger.info(f"Entered search term: {keyword}")
                 
-        except Exception as e:
-            logger.error(f"Error during ads library search: {str(e)}")
-            page.screenshot(path=f"error_{time.strftime('%Y%m%d_%H%M%S')}.png")
-            raise
+                # Wait for the results request to finish; extraction then waits for them to render
+                await wait_for_network_quiet(page, self.network_quiet_timeout)
+        
+        return searched
+
+    async def new_page(self, context):
+        """AgentQL-wrapped page in a worker's browser context"""
+        return await agentql.wrap_async(await context.new_page())
+
+    async def _worker(self, browser, worker_id: int, keywords: asyncio.Queue):
+        """Search keywords from the queue in one isolated browser context until it is empty"""
+        # Create context with the lean profile's viewport and request blocking
+        context = await browser.new_context(**context_options(
+            locale='en-US',
+            timezone_id='America/New_York',
+            # Set language headers for every page in the context
+            extra_http_headers={'Accept-Language': 'en-US,en;q=0.9'}
+        ))
+        await install_async(context, self.request_filter)
+        page = await self.new_page(context)
+        capture = AdCapture(page, self.ad_writer) if self.capture_network else None
+        try:
+            while True:
+                try:
+                    keyword = keywords.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await self.search_keyword(page, keyword, capture)
+                except Exception as e:
+                    # One failed keyword must not stop the others
+                    logger.error(f"[worker {worker_id}] Error searching for '{keyword}': {str(e)}")
+                    self.failed_keywords[keyword] = str(e)
+                    try:
+                        await page.screenshot(path=error_screenshot_path(keyword))
+                    except Exception:
+                        pass
+                    if page.is_closed():
+                        page = await self.new_page(context)
+                        capture = AdCapture(page, self.ad_writer) if self.capture_network else None
+        finally:
+            await context.close()
+
+    async def search_ads_library(self, browser) -> set:
+        """Search every keyword, spread over a pool of browser contexts sharing one browser"""
+        keywords = asyncio.Queue()
+        for keyword in self.search_params.keywords:
+            keywords.put_nowait(keyword)
+        workers = max(1, min(self.workers, len(self.search_params.keywords)))
+        logger.info(f"Searching {keywords.qsize()} keywords with {workers} workers")
+        
+        start = time.perf_counter()
+        # Links of all keywords go to one file, written as they are found
+        self.link_writer = ProfileLinkWriter()
+        self.ad_writer = AdRecordWriter() if self.capture_network else None
+        self.index = AdvertiserIndex()
+        self.run_id = self.index.start_run(self.search_params.keywords)
+        try:
+            await asyncio.gather(*[
+                self._worker(browser, worker_id, keywords) for worker_id in range(1, workers + 1)
+            ])
+        finally:
+            self.link_writer.close()
+            if self.ad_writer:
+                self.ad_writer.close()
+            self.index.finish_run(self.run_id, list(self.failed_keywords))
+        new_advertisers = self.index.new_advertisers(self.run_id - 1)
+        logger.info(f"Run {self.run_id}: {len(new_advertisers)} advertisers not seen in earlier runs "
+                    f"(python advertiser_index.py new --since {self.run_id - 1})")
+        self.index.close()
+        logger.info(f"Searched all keywords in {time.perf_counter() - start:.2f}s")
+        
+        if self.failed_keywords:
+            logger.warning(f"Failed keywords: {', '.join(self.failed_keywords)}")
+        self.selector_cache.save()
+        logger.info(f"AgentQL calls: {self.selector_cache.ai_calls}, answered from the selector cache: {self.selector_cache.hits}")
+        logger.info(f"Requests blocked: {self.request_filter.blocked}, allowed: {self.request_filter.allowed}")
+        return self.link_writer.links
+
+async def run_collector(collector: FacebookAdsCollector) -> set:
+    """Launch one browser and run the collector's keyword search on it"""
+    async with async_playwright() as playwright:
+        # Lean profile (headless unless BROWSER_HEADLESS=0) with English locale
+        browser = await playwright.chromium.launch(**launch_options([
+            '--lang=en-US',
+            '--accept-lang=en-US,en',
+        ]))
+        try:
+            # Perform the search
+            return await collector.search_ads_library(browser)
+        finally:
+            # Close the browser
+            await browser.close()
 
 def main():
     """Main entry point of the script"""
@@ -262,38 +598,7 @@ def main():
         logger.info(f"Starting search with parameters: {search_params.keywords}")
         
         # Initialize browser and perform search
-        with sync_playwright() as playwright:
-            # Configure browser with English locale and full screen
-            browser = playwright.chromium.launch(
-                headless=False,
-                args=[
-                    '--lang=en-US',
-                    '--accept-lang=en-US,en',
-                    '--start-maximized'  # Start browser maximized
-                ]
-            )
-            # Create context with full screen viewport
-            context = browser.new_context(
-                locale='en-US',
-                timezone_id='America/New_York',
-                viewport=None  # This will use the full screen size
-            )
-            page = agentql.wrap(context.new_page())
-            
-            # Ensure the page is maximized
-            page.set_viewport_size({"width": 1920, "height": 1080})  # Full HD size
-            page.evaluate("document.documentElement.requestFullscreen()")
-            
-            # Set language headers directly on the page
-            page.set_extra_http_headers({
-                'Accept-Language': 'en-US,en;q=0.9'
-            })
-            
-            # Perform the search
-            collector.search_ads_library(page)
-            
-            # Close the browser
-            browser.close()
+        asyncio.run(run_collector(collector))
         
     except Exception as e:
         logger.error(f"Failed to initialize the application: {str(e)}")
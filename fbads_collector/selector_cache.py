@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from loguru import logger
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+# Builds a selector for an element that survives page reloads: a non-generated id,
+# a descriptive attribute, the exact text of a short label, or the element's path
+STABLE_SELECTOR_JS = """
+(el) => {
+    const tag = el.tagName.toLowerCase();
+    const quote = (value) => '"' + value.replace(/\\\\/g, '\\\\\\\\').replace(/"/g, '\\\\"') + '"';
+    if (el.id && !/\\d{3,}|:/.test(el.id)) return '#' + CSS.escape(el.id);
+    for (const attr of ['data-testid', 'name', 'placeholder', 'aria-label']) {
+        const value = el.getAttribute(attr);
+        if (value) return `${tag}[${attr}=${quote(value)}]`;
+    }
+    const text = (el.innerText || '').trim();
+    if (text && text.length <= 60 && !text.includes('\\n')) return `${tag}:text-is(${quote(text)})`;
+    const path = [];
+    for (let node = el; node && node !== document.body; node = node.parentElement) {
+        let part = node.tagName.toLowerCase();
+        const siblings = node.parentElement ? [...node.parentElement.children].filter(c => c.tagName === node.tagName) : [];
+        if (siblings.length > 1) part += `:nth-of-type(${siblings.indexOf(node) + 1})`;
+        path.unshift(part);
+    }
+    return 'body > ' + path.join(' > ');
+}
+"""
+
+
+def query_fields(query: str) -> List[str]:
+    """Top-level field names of an AgentQL query, e.g. ['country_search']"""
+    body = query.strip()[1:-1]
+    fields = []
+    depth = 0
+    for token in re.finditer(r"[{}()]|\w+", body):
+        value = token.group()
+        if value in "{(":
+            depth += 1
+        elif value in "})":
+            depth -= 1
+        elif depth == 0:
+            fields.append(value)
+    # Words inside a field's description are at depth 1, so only field names remain
+    return fields
+
+
+def page_template(url: str) -> str:
+    """Pages with the same host and path share a layout, whatever their query string"""
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+
+class SelectorCache:
+    """Memoizes AgentQL element lookups as plain Playwright selectors.
+
+    The first time a query runs on a page template it goes to AgentQL (a remote
+    AI round-trip) and a stable selector is derived for each element it returns.
+    Later lookups of the same query on the same template use those selectors
+    directly; if one of them no longer matches, the entry is dropped and AgentQL
+    is asked again. The cache is shared by all workers and saved between runs.
+    """
+
+    def __init__(self, path: str = None, miss_timeout: int = None):
+        self.path = Path(path or os.getenv('FB_ADS_SELECTOR_CACHE', 'selector_cache.json'))
+        # How long a cached selector may take to appear before it counts as a miss (ms)
+        self.miss_timeout = miss_timeout or int(os.getenv('FB_ADS_SELECTOR_MISS_TIMEOUT_MS', '2000'))
+        self.selectors: Dict[str, str] = self._load()
+        self.hits = 0
+        self.ai_calls = 0
+
+    def _load(self) -> Dict[str, str]:
+        try:
+            return json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """Write the cache to disk (atomic replace)"""
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(self.selectors, indent=2, sort_keys=True), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _key(template: str, query: str, field: str) -> str:
+        query_hash = hashlib.sha1(" ".join(query.split()).encode('utf-8')).hexdigest()[:12]
+        return f"{template}|{query_hash}|{field}"
+
+    async def _cached(self, page, key: str):
+        selector = self.selectors.get(key)
+        if selector is None:
+            return None
+        locator = page.locator(selector).first
+        try:
+            await locator.wait_for(state="attached", timeout=self.miss_timeout)
+            return locator
+        except PlaywrightTimeoutError:
+            logger.info(f"Cached selector no longer matches, asking AgentQL again: {selector}")
+            del self.selectors[key]
+            return None
+
+    async def _stable_selector(self, page, element) -> Optional[str]:
+        try:
+            selector = await element.evaluate(STABLE_SELECTOR_JS)
+            # Only remember selectors that point at exactly this one element
+            if await page.locator(selector).count() == 1:
+                return selector
+        except Exception as e:
+            logger.warning(f"Could not derive a selector: {str(e)}")
+        return None
+
+    async def query_elements(self, page, query: str):
+        """Drop-in for page.query_elements() on single-element queries"""
+        template = page_template(page.url)
+        fields = query_fields(query)
+        found = {}
+        for field in fields:
+            locator = await self._cached(page, self._key(template, query, field))
+            if locator is None:
+                break
+            found[field] = locator
+        else:
+            self.hits += 1
+            return SimpleNamespace(**found)
+
+        self.ai_calls += 1
+        response = await page.query_elements(query)
+        for field in fields:
+            element = getattr(response, field, None)
+            if element is None:
+                continue
+            selector = await self._stable_selector(page, element)
+            if selector:
+                self.selectors[self._key(template, query, field)] = selector
+        return response
@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+from typing import Dict, List
+
+import aiohttp
+
+from clients import load_environment
+from main import MODELS, research_async, save_to_markdown
+from results_store import ResultsStore
+from search_cache import SearchCache
+from search_scheduler import SearchScheduler
+
+# "auto" leaves the model choice to the per-query router
+MODES = list(MODELS) + ["auto"]
+
+
+def question_id(item: Dict) -> str:
+    """Stable ID for a question line - its own "id" field or a hash of question and mode"""
+    if item.get("id") is not None:
+        return str(item["id"])
+    raw = f"{item.get('mode') or ''}\n{item['question']}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def load_questions(input_path: str) -> List[Dict]:
+    """Read questions from a JSONL file: {"question": ..., "mode": "fast"|"quality"|"auto", "id": ...}"""
+    questions = []
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not item.get("question"):
+                raise ValueError(f"Line {line_number} has no question")
+            if item.get("mode") and item["mode"] not in MODES:
+                raise ValueError(f"Line {line_number}: unknown mode '{item['mode']}', expected one of {MODES}")
+            item["id"] = question_id(item)
+            questions.append(item)
+    return questions
+
+
+def load_completed(output_path: str) -> set:
+    """IDs already finished in a previous (possibly crashed) batch run"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A crash can leave a half-written last line
+                continue
+            if record.get("status") == "completed":
+                completed.add(record["id"])
+    return completed
+
+
+def append_result(output_path: str, record: Dict):
+    """Append one result line and make sure it reaches the disk"""
+    with open(output_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+async def run_batch(input_path: str, output_path: str, concurrency: int = 3,
+                    default_mode: str = "auto", cache_mode: str = None) -> Dict:
+    """Run many research pipelines at once, resuming from whatever output_path already holds.
+
+    All pipelines share one search scheduler (so the global concurrency and RPM
+    limits hold across jobs), one search cache, one HTTP session and one results store.
+    """
+    questions = load_questions(input_path)
+    completed = load_completed(output_path)
+    pending = [item for item in questions if item["id"] not in completed]
+    print(f"\n=== Batch research: {len(questions)} questions, {len(questions) - len(pending)} already done ===")
+
+    scheduler = SearchScheduler()
+    cache = SearchCache(mode=cache_mode)
+    store = ResultsStore()
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {"completed": 0, "failed": 0, "skipped": len(questions) - len(pending)}
+
+    async def run_one(session: aiohttp.ClientSession, item: Dict):
+        mode = item.get("mode") or default_mode
+        async with semaphore:
+            try:
+                answer, research_plan, execution_time = await research_async(
+                    item["question"], model=MODELS.get(mode), store=store,
+                    scheduler=scheduler, cache=cache, session=session
+                )
+                save_to_markdown(item["question"], answer, research_plan, execution_time)
+                record = {
+                    "id": item["id"],
+                    "question": item["question"],
+                    "mode": mode,
+                    "status": "completed",
+                    "research_id": research_plan.get("research_id"),
+                    "execution_time": execution_time,
+                    "answer": answer,
+                }
+                counts["completed"] += 1
+            except Exception as e:
+                record = {
+                    "id": item["id"],
+                    "question": item["question"],
+                    "mode": mode,
+                    "status": "failed",
+                    "error": f"{type(e).__name__}: {str(e)}",
+                }
+                counts["failed"] += 1
+                print(f"\n✗ Question {item['id']} failed: {str(e)}")
+        append_result(output_path, record)
+
+    async with aiohttp.ClientSession(connector=scheduler.connector()) as session:
+        await asyncio.gather(*[run_one(session, item) for item in pending])
+
+    store.close()
+    print(f"\n=== Batch finished: {counts['completed']} completed, {counts['failed']} failed, {counts['skipped']} skipped ===")
+    return counts
+
+
+if __name__ == "__main__":
+    load_environment()
+    parser = argparse.ArgumentParser(description="Run research for every question in a JSONL file")
+    parser.add_argument("input", help="JSONL file with one {\"question\": ..., \"mode\": ...} object per line")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL file results are appended to (also used to resume)")
+    parser.add_argument("--concurrency", type=int, default=3, help="Research pipelines running at the same time")
+    parser.add_argument("--mode", choices=MODES, default="auto", help="Mode for questions that do not set one")
+    parser.add_argument("--cache", choices=["use", "refresh", "bypass"], default=None, help="Search cache mode")
+    args = parser.parse_args()
+
+    asyncio.run(run_batch(args.input, args.output, args.concurrency, args.mode, args.cache))
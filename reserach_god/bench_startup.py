@@ -0,0 +1,71 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+# Each snippet runs in a fresh interpreter; it prints its own timing on the last line
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+FIRST_CALL_SNIPPETS = {
+    "CodeChangeTracker()": """
+import time
+from code_tracker import CodeChangeTracker
+start = time.perf_counter()
+CodeChangeTracker()
+print(time.perf_counter() - start)
+""",
+    "first async client": """
+import asyncio, time
+import main
+
+async def first_client():
+    start = time.perf_counter()
+    main.get_async_openai_client()
+    return time.perf_counter() - start
+
+print(asyncio.run(first_client()))
+""",
+}
+
+
+def run_snippet(code: str, cwd: str) -> Dict:
+    """Run code in a fresh interpreter and return its timing and anything else it printed"""
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "bench")}
+    result = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "snippet failed")
+    lines = result.stdout.strip().splitlines()
+    return {"seconds": float(lines[-1]), "output": lines[:-1]}
+
+
+def bench(code: str, cwd: str, repeat: int) -> Dict:
+    runs = [run_snippet(code, cwd) for _ in range(repeat)]
+    times: List[float] = [run["seconds"] for run in runs]
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "printed_lines": len(runs[0]["output"]),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure import time and first-call overhead of the research modules")
+    parser.add_argument("--repeat", type=int, default=10, help="Fresh interpreters per measurement")
+    parser.add_argument("--modules", nargs="+", default=["main", "code_tracker", "batch", "service"])
+    args = parser.parse_args()
+
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    print(f"{'Measurement':<32} {'median (ms)':>12} {'min (ms)':>10} {'printed':>8}")
+    for module in args.modules:
+        stats = bench(IMPORT_SNIPPET.format(module=module), cwd, args.repeat)
+        print(f"{'import ' + module:<32} {stats['median'] * 1000:>12.1f} {stats['min'] * 1000:>10.1f} {stats['printed_lines']:>8}")
+    for name, code in FIRST_CALL_SNIPPETS.items():
+        stats = bench(code, cwd, args.repeat)
+        print(f"{name:<32} {stats['median'] * 1000:>12.1f} {stats['min'] * 1000:>10.1f} {stats['printed_lines']:>8}")
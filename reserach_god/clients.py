@@ -0,0 +1,38 @@
+import asyncio
+import weakref
+
+# Importing openai takes most of a second, so it only happens when a client is first needed
+_environment_loaded = False
+_openai_client = None
+# The async client's connection pool is tied to the event loop it first ran on,
+# so keep one per loop - research() starts a new loop on every call
+_async_openai_clients = weakref.WeakKeyDictionary()
+
+
+def load_environment():
+    """Load .env once; later calls are free"""
+    global _environment_loaded
+    if not _environment_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _environment_loaded = True
+
+
+def get_openai_client() -> "OpenAI":
+    """Shared OpenAI client, created on first use"""
+    global _openai_client
+    if _openai_client is None:
+        load_environment()
+        from openai import OpenAI
+        _openai_client = OpenAI()
+    return _openai_client
+
+
+def get_async_openai_client() -> "AsyncOpenAI":
+    """AsyncOpenAI client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    if loop not in _async_openai_clients:
+        load_environment()
+        from openai import AsyncOpenAI
+        _async_openai_clients[loop] = AsyncOpenAI()
+    return _async_openai_clients[loop]
@@ -1,86 +1,203 @@
 from pathlib import Path
 import difflib
 from datetime import datetime
-from openai import OpenAI
 import os
-from dotenv import load_dotenv
 import json
+import hashlib
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from synthesis import estimate_tokens
+from clients import get_openai_client
 
-# Load environment variables for OpenAI
-load_dotenv()
+# Directories never worth tracking (outputs, caches, environments)
+SKIP_DIRS = {'__pycache__', '.git', '.tracker_blobs', '.tracker_summaries', 'research_results', 'search_cache', 'progress_archive', 'venv', '.venv', 'node_modules'}
+SKIP_FILES = {'last_state.json'}
 
 class CodeChangeTracker:
     def __init__(self):
-        self.client = OpenAI()
         self.last_state_file = "last_state.json"
+        self.blob_dir = Path(".tracker_blobs")  # Content-addressed copies of tracked files
+        self.summary_dir = Path(".tracker_summaries")  # GPT summaries keyed by diff hash
         self.tracked_extensions = ['.py', '.txt', '.md']  # Files to track
+        self.diff_token_budget = int(os.getenv("TRACKER_DIFF_TOKEN_BUDGET", "6000"))  # Per summarization call
+        self.max_parallel = int(os.getenv("TRACKER_SUMMARY_CONCURRENCY", "4"))
         
-    def get_file_contents(self):
-        """Get current content of all tracked files"""
-        current_state = {}
-        for ext in self.tracked_extensions:
-            for file in Path('.').glob(f'*{ext}'):
-                # Skip certain files
-                if any(skip in str(file) for skip in ['__pycache__', '.git', 'last_state.json']):
+    @property
+    def client(self):
+        """Shared OpenAI client - only built once there are changes to summarize"""
+        return get_openai_client()
+
+    def iter_tracked_files(self):
+        """Yield (path, stat) for every tracked file, recursing into subdirectories"""
+        for root, dirs, files in os.walk('.'):
+            dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and not d.startswith('.'))
+            for name in sorted(files):
+                if name in SKIP_FILES or Path(name).suffix not in self.tracked_extensions:
                     continue
-                    
+                path = os.path.normpath(os.path.join(root, name))
                 try:
-                    with open(file, 'r', encoding='utf-8') as f:
-                        current_state[str(file)] = f.read()
-                except UnicodeDecodeError:
-                    print(f"Skipping binary file: {file}")
-                except Exception as e:
-                    print(f"Error reading {file}: {str(e)}")
-        
-        return current_state
+                    yield path, os.stat(path)
+                except OSError as e:
+                    print(f"Error reading {path}: {str(e)}")
 
-    def analyze_changes(self):
-        """Compare current files with last saved state"""
-        current_state = self.get_file_contents()
-        
-        # Load previous state if exists
+    def _blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / digest
+
+    def store_blob(self, content: str) -> str:
+        """Save file content under its hash and return the hash"""
+        data = content.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_bytes(zlib.compress(data))
+            os.replace(tmp_path, path)
+        return digest
+
+    def read_blob(self, digest: str) -> str:
+        """Load file content saved by store_blob"""
+        return zlib.decompress(self._blob_path(digest).read_bytes()).decode('utf-8')
+
+    def load_state(self):
+        """Load the previous {path: {mtime_ns, size, sha256}} map, upgrading the old full-text format"""
         try:
-            if os.path.exists(self.last_state_file):
-                with open(self.last_state_file, 'r', encoding='utf-8') as f:
-                    previous_state = json.load(f)
-            else:
-                previous_state = {}
+            if not os.path.exists(self.last_state_file):
+                return {}
+            with open(self.last_state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
         except Exception:
-            previous_state = {}
+            return {}
+
+        if state.get('version') == 2:
+            return state['files']
+
+        # Old format stored the full text of every file - move it into the blob store.
+        # mtime is unknown, so every file gets hashed once on the next scan.
+        return {
+            path: {'mtime_ns': None, 'size': None, 'sha256': self.store_blob(content)}
+            for path, content in state.items()
+            if isinstance(content, str)
+        }
+
+    def save_state(self, files):
+        tmp_file = f"{self.last_state_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': 2, 'files': files}, f, separators=(',', ':'))
+        os.replace(tmp_file, self.last_state_file)
+
+    def prune_blobs(self, files):
+        """Delete blobs no longer referenced by the current state"""
+        if not self.blob_dir.exists():
+            return
+        referenced = {meta['sha256'] for meta in files.values() if meta['sha256']}
+        for blob in self.blob_dir.glob('*/*'):
+            if blob.name not in referenced:
+                blob.unlink(missing_ok=True)
+
+    def scan(self, previous_state):
+        """Build the current state, reading only files whose mtime or size changed.
+
+        Files that are not UTF-8 text are kept with skipped=True and no hash, so they
+        are not read again until they change. Returns the new state and the content
+        of every file that was read, keyed by path.
+        """
+        current_state = {}
+        read_contents = {}
+        for path, stat in self.iter_tracked_files():
+            previous = previous_state.get(path)
+            if previous and previous['mtime_ns'] == stat.st_mtime_ns and previous['size'] == stat.st_size:
+                current_state[path] = previous
+                continue
+
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except UnicodeDecodeError:
+                print(f"Skipping binary file: {path}")
+                current_state[path] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': None, 'skipped': True}
+                continue
+            except Exception as e:
+                print(f"Error reading {path}: {str(e)}")
+                continue
+
+            digest = self.store_blob(content)
+            current_state[path] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': digest}
+            read_contents[path] = content
+
+        return current_state, read_contents
+
+    def analyze_changes(self):
+        """Compare current files with last saved state"""
+        previous_state = self.load_state()
+        current_state, read_contents = self.scan(previous_state)
 
         # Save current state for next comparison
-        with open(self.last_state_file, 'w', encoding='utf-8') as f:
-            json.dump(current_state, f, indent=2)
+        self.save_state(current_state)
 
         if not previous_state:
             return "Initial state saved"
 
-        # Compare states and collect changes
-        changes = []
-        for file in set(current_state.keys()) | set(previous_state.keys()):
+        # Compare states and collect changes - only files that were re-read can differ
+        changes = []  # Notes that need no summarizing (new/deleted files)
+        diffs = []  # (file, unified diff text)
+        for file in sorted(set(current_state.keys()) | set(previous_state.keys())):
             if file not in previous_state:
                 changes.append(f"New file created: {file}")
             elif file not in current_state:
                 changes.append(f"File deleted: {file}")
-            elif current_state[file] != previous_state[file]:
+            elif current_state[file]['sha256'] != previous_state[file]['sha256']:
+                if current_state[file].get('skipped') or previous_state[file].get('skipped'):
+                    changes.append(f"\nChanges in {file}: not readable as UTF-8 text in one of the versions")
+                    continue
+                try:
+                    old_content = self.read_blob(previous_state[file]['sha256'])
+                except (OSError, zlib.error):
+                    changes.append(f"\nChanges in {file}: previous version unavailable")
+                    continue
                 diff = list(difflib.unified_diff(
-                    previous_state[file].splitlines(),
-                    current_state[file].splitlines(),
+                    old_content.splitlines(),
+                    read_contents[file].splitlines(),
                     fromfile=f'previous/{Path(file).name}',
                     tofile=f'current/{Path(file).name}',
                     lineterm=''
                 ))
                 if diff:
-                    changes.append(f"\nChanges in {file}:\n" + '\n'.join(diff))
+                    diffs.append((file, '\n'.join(diff)))
+
+        if changes or diffs:
+            self.prune_blobs(current_state)
 
-        if not changes:
+        if not changes and not diffs:
             return "No changes detected"
 
-        # Use GPT to analyze the changes
+        # Summarize each file's diff on its own (in parallel, cached by diff hash)
+        chunks = [(file, chunk) for file, diff in diffs for chunk in self.split_diff(diff)]
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as executor:
+            summaries = list(executor.map(lambda item: self.summarize_diff(*item), chunks))
+
+        file_summaries = []
+        failed = []
+        for (file, chunk), summary in zip(chunks, summaries):
+            if summary is None:
+                failed.append(f"\nChanges in {file}:\n{chunk}")
+            else:
+                file_summaries.append(f"### {file}\n{summary}")
+
+        if failed and not file_summaries:
+            return "Error analyzing changes with GPT\n\nRaw changes:\n" + "\n".join(changes + failed)
+
+        # Use GPT to merge the per-file summaries - with only new/deleted files there are none
+        summaries_text = "\n\n".join(file_summaries) or "None"
+        other_changes = "\n".join(changes) or "None"
         prompt = f"""
-        Analyze these code and file changes and provide a clear, organized summary:
+        Below are summaries of code and file changes, one per changed file, plus a list of
+        new and deleted files. Merge them into a clear, organized summary:
 
-        {changes}
+        {summaries_text}
+
+        New and deleted files:
+        {other_changes}
 
         Please provide:
         1. A concise bullet-point list of significant changes
@@ -97,12 +214,187 @@ class CodeChangeTracker:
                 model="gpt-4-turbo-preview",
                 messages=[{"role": "user", "content": prompt}]
             )
-            return response.choices[0].message.content
+            result = response.choices[0].message.content
+        except Exception as e:
+            result = f"Error merging change summaries with GPT: {str(e)}\n\n{summaries_text}\n\n" + "\n".join(changes)
+
+        if failed:
+            result += "\n\nRaw changes (could not be summarized):\n" + "\n".join(failed)
+        return result
+
+    def split_diff(self, diff: str):
+        """Split a diff at hunk boundaries into chunks that fit the token budget"""
+        if estimate_tokens(diff) <= self.diff_token_budget:
+            return [diff]
+
+        hunks = []
+        for line in diff.splitlines():
+            if line.startswith('@@') or not hunks:
+                hunks.append([])
+            hunks[-1].append(line)
+
+        chunks = []
+        current = []
+        current_tokens = 0
+        for hunk in hunks:
+            text = '\n'.join(hunk)
+            tokens = estimate_tokens(text)
+            if tokens > self.diff_token_budget:
+                # A single huge hunk is cut down rather than skipped
+                text = text[:self.diff_token_budget * 4] + "\n[... hunk truncated ...]"
+                tokens = self.diff_token_budget
+            if current and current_tokens + tokens > self.diff_token_budget:
+                chunks.append('\n'.join(current))
+                current = []
+                current_tokens = 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            chunks.append('\n'.join(current))
+        return chunks
+
+    def summarize_diff(self, file: str, diff: str):
+        """Summarize one diff chunk, reusing the cached summary if this exact diff was seen before"""
+        digest = hashlib.sha256(f"{file}\n{diff}".encode('utf-8')).hexdigest()
+        cache_file = self.summary_dir / f"{digest}.md"
+        if cache_file.exists():
+            return cache_file.read_text(encoding='utf-8')
+
+        prompt = f"""
+        Summarize the functional changes in this unified diff of {file}:
+
+        {diff}
+
+        Use a few concise bullet points. Ignore formatting-only changes.
+        """
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-4-turbo-preview",
+                messages=[{"role": "user", "content": prompt}]
+            )
+            summary = response.choices[0].message.content
         except Exception as e:
-            return f"Error analyzing changes with GPT: {str(e)}\n\nRaw changes:\n" + "\n".join(changes)
+            print(f"Error summarizing changes in {file}: {str(e)}")
+            return None
+
+        self.summary_dir.mkdir(exist_ok=True)
+        cache_file.write_text(summary, encoding='utf-8')
+        return summary
+
+PROGRESS_HEADER = "# Development Progress\n\nTrack of changes made to the research script.\n\n"
+
+class ProgressJournal:
+    """Append-only PROGRESS.md with size-based rotation and an offset index.
+
+    Entries are only ever appended (and fsync'd), so a crash can at worst leave a
+    truncated last entry. When PROGRESS.md grows past max_bytes it is moved to
+    progress_archive/ as a numbered segment and a fresh file is started. Every
+    entry's segment, byte offset and length are appended to progress_index.jsonl,
+    so the latest updates can be read without parsing the whole history.
+    """
+
+    def __init__(self, path: str = "PROGRESS.md", max_bytes: int = None):
+        self.path = Path(path)
+        self.archive_dir = self.path.parent / "progress_archive"
+        self.index_file = self.path.parent / "progress_index.jsonl"
+        self.max_bytes = max_bytes or int(os.getenv("PROGRESS_MAX_BYTES", str(1024 * 1024)))
+
+    def _archive_path(self, segment: int) -> Path:
+        return self.archive_dir / f"{self.path.stem}_{segment:04d}{self.path.suffix}"
+
+    def current_segment(self) -> int:
+        """Number of the live segment - one past the last archived one"""
+        if not self.archive_dir.exists():
+            return 1
+        numbers = [int(p.stem.rsplit('_', 1)[1]) for p in self.archive_dir.glob(f"{self.path.stem}_*{self.path.suffix}")]
+        return max(numbers, default=0) + 1
+
+    def segment_path(self, segment: int) -> Path:
+        archived = self._archive_path(segment)
+        return archived if archived.exists() else self.path
+
+    def _newline(self) -> str:
+        """Line ending of the live file, so appended entries match it; the OS default for a new file"""
+        try:
+            with open(self.path, "rb") as f:
+                first_line = f.readline()
+        except FileNotFoundError:
+            return os.linesep
+        return "\r\n" if first_line.endswith(b"\r\n") else "\n"
+
+    @staticmethod
+    def _append(path: Path, data: bytes):
+        with open(path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _index_existing(self, segment: int):
+        """Build index entries for a PROGRESS.md written before the journal existed"""
+        data = self.path.read_bytes()
+        starts = []
+        position = data.find(b"\n## Update ")
+        while position != -1:
+            starts.append(position)
+            position = data.find(b"\n## Update ", position + 1)
+        lines = []
+        for start, end in zip(starts, starts[1:] + [len(data)]):
+            timestamp = data[start + 11:data.find(b"\n", start + 1)].decode('utf-8', 'replace').strip()
+            lines.append(json.dumps({"timestamp": timestamp, "segment": segment, "offset": start, "length": end - start}))
+        if lines:
+            self._append(self.index_file, ("\n".join(lines) + "\n").encode('utf-8'))
+
+    def append(self, timestamp: str, entry: str):
+        """Append one entry, rotating the current segment first if it is full"""
+        newline = self._newline()
+        data = entry.replace("\r\n", "\n").replace("\n", newline).encode('utf-8')
+        header = PROGRESS_HEADER.replace("\n", newline).encode('utf-8')
+        segment = self.current_segment()
+
+        if not self.path.exists():
+            self._append(self.path, header)
+        elif not self.index_file.exists():
+            self._index_existing(segment)
+
+        size = self.path.stat().st_size
+        if size > len(header) and size + len(data) > self.max_bytes:
+            self.archive_dir.mkdir(exist_ok=True)
+            os.replace(self.path, self._archive_path(segment))
+            segment += 1
+            self._append(self.path, header)
+            size = self.path.stat().st_size
+
+        self._append(self.path, data)
+        record = {"timestamp": timestamp, "segment": segment, "offset": size, "length": len(data)}
+        self._append(self.index_file, (json.dumps(record) + "\n").encode('utf-8'))
+
+    def _tail_index(self, n: int):
+        """Last n index records, read backwards from the end of the index file"""
+        if n <= 0 or not self.index_file.exists():
+            return []
+        with open(self.index_file, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            data = b""
+            while position > 0 and data.count(b"\n") <= n:
+                step = min(4096, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+        lines = [line for line in data.splitlines() if line.strip()][-n:]
+        return [json.loads(line) for line in lines]
+
+    def latest(self, n: int = 5):
+        """The n most recent entries, oldest first, as (timestamp, text)"""
+        entries = []
+        for record in self._tail_index(n):
+            with open(self.segment_path(record["segment"]), "rb") as f:
+                f.seek(record["offset"])
+                entries.append((record["timestamp"], f.read(record["length"]).decode('utf-8', 'replace')))
+        return entries
 
 def update_progress_file(changes: str):
-    """Update PROGRESS.md with latest changes"""
+    """Append the latest changes to the PROGRESS.md journal"""
     if changes in ["No changes detected", "Initial state saved"]:
         return
         
@@ -116,11 +408,4 @@ def update_progress_file(changes: str):
 ---
 """
     
-    progress_file = Path("PROGRESS.md")
-    if not progress_file.exists():
-        content = "# Development Progress\n\nTrack of changes made to the research script.\n\n"
-    else:
-        content = progress_file.read_text(encoding='utf-8')
-    
-    with open(progress_file, "w", encoding='utf-8') as f:
-        f.write(content + new_entry) 
\ No newline at end of file
+    ProgressJournal().append(timestamp, new_entry)
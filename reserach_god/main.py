@@ -1,42 +1,37 @@
-from openai import OpenAI
-from dotenv import load_dotenv
 import os
 import json
-from typing import List, Dict
+from typing import Callable, List, Dict
 import datetime
 import asyncio
+import contextlib
+import argparse
 import aiohttp
+from clients import get_async_openai_client, load_environment
 from code_tracker import CodeChangeTracker, update_progress_file
+from search_scheduler import SearchScheduler
+from search_cache import SearchCache
+from query_stream import SearchQueryStreamParser
+from synthesis import MapReduceSynthesizer
+from query_dedup import QueryDeduplicator
+from results_store import ResultsStore
+from metrics import PipelineMetrics, metrics_markdown, usage_dict
+from model_router import LARGE_MODEL, SMALL_MODEL, ModelRouter
 
-# Load environment variables
-load_dotenv()
-print("Environment variables loaded...")
+# Perplexity model behind each mode; "auto" (no fixed model) routes every query
+MODELS = {
+    "fast": SMALL_MODEL,
+    "quality": LARGE_MODEL,
+}
 
-# Initialize clients
-openai_client = OpenAI()
-perplexity_client = OpenAI(
-    api_key=os.getenv("PERPLEXITY_API_KEY"),
-    base_url="https://api.perplexity.ai"
-)
-print("API clients initialized...")
+async def generate_research_queries_async(user_input: str, on_query: Callable[[str], None] = None,
+                                          metrics: PipelineMetrics = None, previous: Dict = None) -> Dict:
+    """First agent: Generates research queries based on user input
 
-def choose_mode() -> str:
-    """Choose between fast mode (smaller model) or quality mode (larger model)"""
-    print("\nAvailable modes:")
-    print("1. Quality mode (default) - Uses more powerful model for better results")
-    print("2. Fast mode - Uses lighter model for quicker results")
-    
-    choice = input("\nDo you want to run in fast mode? (y/n): ").lower()
-    
-    if choice == 'y':
-        print("✓ Fast mode selected - Using llama-3.1-sonar-small-128k-online")
-        return "llama-3.1-sonar-small-128k-online"
-    else:
-        print("✓ Quality mode selected - Using llama-3.1-sonar-large-128k-online")
-        return "llama-3.1-sonar-large-128k-online"
-
-def generate_research_queries(user_input: str) -> Dict:
-    """First agent: Generates research queries based on user input"""
+    The answer is streamed, and on_query is called with each search query as soon
+    as it has been fully generated, so searches can start before the list is complete.
+    previous: {"question": ..., "queries": [...]} of earlier research this is a
+    follow-up to - only angles it did not cover are asked for.
+    """
     print(f"\n1. Generating research queries for: '{user_input}'")
     
     prompt = f"""
@@ -68,76 +63,151 @@ def generate_research_queries(user_input: str) -> Dict:
     
     User Query: {user_input}
     """
+    if previous:
+        covered = "\n".join(f"    - {query}" for query in previous["queries"])
+        prompt += f"""
+    This is a follow-up to earlier research on: {previous['question']}
+    Already covered by that research (its findings will be reused):
+{covered}
+
+    Do NOT repeat these angles. Only generate search queries for what the follow-up
+    question needs that is not covered yet - fewer than 10 is fine, even 1 or 2.
+    """
     
-    response = openai_client.chat.completions.create(
-        model="gpt-4-turbo-preview",
-        messages=[{"role": "user", "content": prompt}],
-        response_format={ "type": "json_object" }
-    )
-    
-    result = json.loads(response.choices[0].message.content)
+    metrics = metrics or PipelineMetrics()
+    with metrics.span("query_generation") as span:
+        stream = await get_async_openai_client().chat.completions.create(
+            model="gpt-4-turbo-preview",
+            messages=[{"role": "user", "content": prompt}],
+            response_format={ "type": "json_object" },
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        
+        parser = SearchQueryStreamParser()
+        dispatched = []
+        usage = None
+        async for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            for query in parser.feed(chunk.choices[0].delta.content):
+                dispatched.append(query)
+                if len(dispatched) == 1:
+                    span.attributes["time_to_first_query"] = round(span.duration, 4)
+                print(f"   → Query {len(dispatched)} ready: {query}")
+                if on_query:
+                    on_query(query)
+        span.add_usage("gpt-4-turbo-preview", usage)
+    
+    result = json.loads(parser.buffer)
+    
+    # Anything the incremental parser could not pick up is dispatched now
+    for query in result['search_queries'][len(dispatched):]:
+        dispatched.append(query)
+        print(f"   → Query {len(dispatched)} ready: {query}")
+        if on_query:
+            on_query(query)
     
-    # Print the reasoning/analysis first
     print("\n✓ Topic Analysis:")
     print(f"{result['topic_analysis']}")
-    
-    # Then print the queries
-    print("\n✓ Generated research queries:")
-    for i, query in enumerate(result['search_queries'], 1):
-        print(f"   {i}. {query}")
+    print(f"\n✓ Generated {len(dispatched)} research queries")
     
     return result
 
-async def perform_single_search(session, query: str, i: int, model: str) -> Dict:
-    """Perform a single search query"""
+def generate_research_queries(user_input: str) -> Dict:
+    """Wrapper function to run query generation outside an event loop"""
+    return asyncio.run(generate_research_queries_async(user_input))
+
+SEARCH_SYSTEM_PROMPT = (
+    "You are a highly analytical research assistant focused on evidence-based findings. "
+    "Your task is to:\n"
+    "1. Deeply analyze the query to understand the core research needs\n"
+    "2. Provide strictly factual information supported by reliable sources\n"
+    "3. Focus on recent, peer-reviewed research and authoritative sources\n"
+    "4. Draw precise conclusions that directly address the query context\n"
+    "5. Prioritize accuracy and relevance over breadth\n"
+    "6. Cite specific studies, papers, or expert sources where possible\n"
+    "7. Highlight any important caveats or limitations in the findings\n\n"
+    "Ensure your response is concise, well-structured, and directly addresses "
+    "the key aspects of the query while maintaining strict factual accuracy."
+)
+
+async def perform_single_search(session, query: str, i: int, model: str, scheduler: SearchScheduler,
+                                cache: SearchCache = None, metrics: PipelineMetrics = None) -> Dict:
+    """Perform a single search query through the scheduler, answering from the cache when possible"""
+    metrics = metrics or PipelineMetrics()
+    if cache:
+        cached = cache.get(model, SEARCH_SYSTEM_PROMPT, query)
+        if cached:
+            metrics.record("search", query, 0.0, model=model, cached=True)
+            return {
+                "query": query,
+                "response": cached["response"],
+                "model": model,
+                "cached": True,
+                "queue_wait": 0.0,
+                "service_time": 0.0,
+            }
+
     try:
-        async with session.post(
-            "https://api.perplexity.ai/chat/completions",
-            headers={
-                "Authorization": f"Bearer {os.getenv('PERPLEXITY_API_KEY')}",
-                "Content-Type": "application/json"
-            },
-            json={
+        outcome = await scheduler.submit(
+            session,
+            payload={
                 "model": model,
                 "messages": [
                     {
                         "role": "system",
-                        "content": (
-                            "You are a highly analytical research assistant focused on evidence-based findings. "
-                            "Your task is to:\n"
-                            "1. Deeply analyze the query to understand the core research needs\n"
-                            "2. Provide strictly factual information supported by reliable sources\n"
-                            "3. Focus on recent, peer-reviewed research and authoritative sources\n"
-                            "4. Draw precise conclusions that directly address the query context\n"
-                            "5. Prioritize accuracy and relevance over breadth\n"
-                            "6. Cite specific studies, papers, or expert sources where possible\n"
-                            "7. Highlight any important caveats or limitations in the findings\n\n"
-                            "Ensure your response is concise, well-structured, and directly addresses "
-                            "the key aspects of the query while maintaining strict factual accuracy."
-                        ),
+                        "content": SEARCH_SYSTEM_PROMPT,
                     },
                     {
                         "role": "user",
                         "content": query,
                     },
                 ]
-            }
-        ) as response:
-            result = await response.json()
-            return {
-                "query": query,
-                "response": result['choices'][0]['message']['content']
-            }
+            },
+            headers={
+                "Authorization": f"Bearer {os.getenv('PERPLEXITY_API_KEY')}",
+                "Content-Type": "application/json"
+            },
+        )
+        span = metrics.record(
+            "search", query, outcome["queue_wait"] + outcome["service_time"], model=model,
+            queue_wait=round(outcome["queue_wait"], 4), ttfb=outcome["ttfb"] and round(outcome["ttfb"], 4),
+            attempts=outcome["attempts"], error=outcome["error"], hedged=bool(outcome.get("hedged"))
+        )
+        if outcome["error"]:
+            raise RuntimeError(f"{outcome['error']} after {outcome['attempts']} attempt(s)")
+        span.add_usage(model, outcome["data"].get("usage"), requests=outcome["attempts"])
+
+        answer = outcome["data"]['choices'][0]['message']['content']
+        if cache:
+            cache.put(model, SEARCH_SYSTEM_PROMPT, query, answer)
+
+        return {
+            "query": query,
+            "response": answer,
+            "model": model,
+            "citations": outcome["data"].get("citations") or [],
+            "completion_tokens": usage_dict(outcome["data"].get("usage"))["completion_tokens"],
+            "queue_wait": outcome["queue_wait"],
+            "service_time": outcome["service_time"],
+        }
     except Exception as e:
         print(f"\n   ✗ Error in search {i}: {str(e)}")
         return {
             "query": query,
-            "response": f"Error: {str(e)}"
+            "response": f"Error: {str(e)}",
+            "model": model,
+            "error": True,
         }
 
-async def perform_web_searches_async(queries: List[str], model: str) -> List[Dict]:
+async def perform_web_searches_async(queries: List[str], model: str, scheduler: SearchScheduler = None, cache: SearchCache = None) -> List[Dict]:
     """Performs web searches using Perplexity API concurrently"""
     print("\n2. Performing web searches concurrently...")
+    scheduler = scheduler or SearchScheduler()
+    cache = cache or SearchCache()
     total_queries = len(queries)
     completed_queries = 0
     
@@ -145,35 +215,72 @@ async def perform_web_searches_async(queries: List[str], model: str) -> List[Dic
         nonlocal completed_queries
         print(f"\r   Progress: {completed_queries}/{total_queries} queries completed ({(completed_queries/total_queries)*100:.1f}%)", end="")
         
-        result = await perform_single_search(session, query, i, model)
+        result = await perform_single_search(session, query, i, model, scheduler, cache)
         
         completed_queries += 1
         print(f"\r   Progress: {completed_queries}/{total_queries} queries completed ({(completed_queries/total_queries)*100:.1f}%)", end="")
         return result
     
-    async with aiohttp.ClientSession() as session:
+    async with aiohttp.ClientSession(connector=scheduler.connector()) as session:
         tasks = [
             search_with_progress(session, query, i+1) 
             for i, query in enumerate(queries)
         ]
         results = await asyncio.gather(*tasks)
     
-    print("\n   ✓ All searches completed")
+    print_search_summary(results, scheduler, cache)
+    return results
+
+def print_search_summary(results: List[Dict], scheduler: SearchScheduler, cache: SearchCache):
+    """Print success counts plus scheduler and cache statistics"""
+    missing = sum(1 for r in results if r.get("missing"))
+    failed = sum(1 for r in results if r.get("error")) - missing
+    stats = scheduler.summary()
+    print(f"\n   ✓ All searches completed ({len(results) - failed - missing} succeeded, {failed} failed, {missing} past the deadline)")
+    print(
+        f"   Queue wait: mean {stats['queue_wait']['mean']:.2f}s, p95 {stats['queue_wait']['p95']:.2f}s | "
+        f"Service time: mean {stats['service_time']['mean']:.2f}s, p95 {stats['service_time']['p95']:.2f}s | "
+        f"Retries: {stats['retries']}, rate limited: {stats['rate_limited']}, "
+        f"hedged: {stats['hedges']} ({stats['hedge_wins']} won by the hedge)"
+    )
+    cache_stats = cache.stats()
+    print(f"   Cache ({cache_stats['mode']}): {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+
+async def gather_until_deadline(tasks: List[tuple], timeout: float = None) -> List[Dict]:
+    """Collect (query, task) search results, giving up on whatever is still running after timeout seconds"""
+    if not tasks:
+        return []
+    done, pending = await asyncio.wait([task for _, task in tasks], timeout=timeout)
+    for task in pending:
+        task.cancel()
+    # Let cancelled requests release their connections and scheduler slots
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    results = []
+    for query, task in tasks:
+        if task in done:
+            results.append(task.result())
+        else:
+            print(f"\n   ✗ No answer before the research deadline: {query}")
+            results.append({
+                "query": query,
+                "response": "Error: no answer before the research deadline",
+                "error": True,
+                "missing": True,
+            })
     return results
 
-def perform_web_searches(queries: List[str], model: str) -> List[Dict]:
+def perform_web_searches(queries: List[str], model: str, cache: SearchCache = None) -> List[Dict]:
     """Wrapper function to run async searches"""
-    return asyncio.run(perform_web_searches_async(queries, model))
+    return asyncio.run(perform_web_searches_async(queries, model, cache=cache))
 
-def synthesize_research(original_prompt: str, search_results: List[Dict]) -> str:
-    """Second agent: Synthesizes all research into a final answer"""
-    print("\n3. Synthesizing research findings...")
-    
+def build_synthesis_prompt(original_prompt: str, findings_text: str) -> str:
+    """Build the prompt for the synthesis agent"""
     synthesis_prompt = f"""
     Original user query: {original_prompt}
     
     Research findings:
-    {json.dumps(search_results, indent=2)}
+    {findings_text}
     
     Please analyze these findings deeply and synthesize them into a clear, engaging answer that directly addresses the user's needs:
 
@@ -193,53 +300,168 @@ def synthesize_research(original_prompt: str, search_results: List[Dict]) -> str
     Your response should be captivating yet concise - make complex ideas crystal clear while keeping readers hooked from start to finish. Write like you're telling a fascinating story, not delivering a dry lecture. Make the output more concrete with detailed action steps when it makes sense.
 
     """
+    return synthesis_prompt
+
+async def synthesize_research_async(original_prompt: str, search_results: List[Dict], writer: "MarkdownReportWriter" = None,
+                                    metrics: PipelineMetrics = None, on_token: Callable[[str], None] = None) -> str:
+    """Second agent: Synthesizes all research into a final answer
+
+    With a writer, the answer is streamed: printed and saved as tokens arrive.
+    With on_token, the answer is streamed and each token is passed to it.
+    Findings that do not fit the token budget are condensed map-reduce style first.
+    """
+    print("\n3. Synthesizing research findings...")
     
-    response = openai_client.chat.completions.create(
-        model="gpt-4-turbo-preview",
-        messages=[{"role": "user", "content": synthesis_prompt}]
-    )
-    
-    print("✓ Research synthesis completed")
-    return response.choices[0].message.content
+    # Failed searches carry no information, so keep them out of the prompt
+    findings = [
+        {"query": r["query"], "response": r["response"]}
+        for r in search_results if not r.get("error")
+    ]
+    metrics = metrics or PipelineMetrics()
+    findings_text, info = await MapReduceSynthesizer(get_async_openai_client(), metrics=metrics).prepare(original_prompt, findings)
+    if info["mode"] == "single-pass":
+        print(f"   Findings fit the budget (~{info['input_tokens']} tokens) - single-pass synthesis")
+    else:
+        print(f"   Condensed ~{info['input_tokens']} tokens of findings to ~{info['output_tokens']} in {info['levels']} level(s)")
+    prompt = build_synthesis_prompt(original_prompt, findings_text)
+    
+    if writer is None and on_token is None:
+        with metrics.span("synthesis", mode=info["mode"]) as span:
+            response = await get_async_openai_client().chat.completions.create(
+                model="gpt-4-turbo-preview",
+                messages=[{"role": "user", "content": prompt}]
+            )
+            span.add_usage("gpt-4-turbo-preview", response.usage)
+        print("✓ Research synthesis completed")
+        return response.choices[0].message.content
+    
+    print("   Streaming synthesis...\n")
+    with metrics.span("synthesis", mode=info["mode"]) as span:
+        stream = await get_async_openai_client().chat.completions.create(
+            model="gpt-4-turbo-preview",
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        
+        parts = []
+        usage = None
+        async for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                if not parts:
+                    span.attributes["time_to_first_token"] = round(span.duration, 4)
+                if writer:
+                    print(token, end="", flush=True)
+                    writer.write(token)
+                if on_token:
+                    on_token(token)
+                parts.append(token)
+        span.add_usage("gpt-4-turbo-preview", usage)
+    
+    print("\n\n✓ Research synthesis completed")
+    return "".join(parts)
+
+def synthesize_research(original_prompt: str, search_results: List[Dict]) -> str:
+    """Wrapper function to run synthesis outside an event loop"""
+    return asyncio.run(synthesize_research_async(original_prompt, search_results))
 
-def get_next_file_number():
-    """Get the next available file number by checking existing files"""
+def report_path(research_id: int) -> str:
+    """Markdown export path for a research run"""
     os.makedirs("research_results", exist_ok=True)
-    existing_files = os.listdir("research_results")
-    numbers = [int(f.split('_')[1].split('.')[0]) for f in existing_files 
-              if f.startswith('research_') and f.endswith('.md')]
-    return max(numbers, default=0) + 1
+    return os.path.join("research_results", f"research_{research_id:04d}.md")
 
-def save_to_markdown(user_input: str, result: str, research_plan: Dict, execution_time: float):
-    """Save research results to a markdown file with sequential numbering"""
-    # Get next available number
-    file_number = get_next_file_number()
-    
-    # Create filename with just the number
-    filename = f"research_{file_number:04d}.md"
-    filepath = os.path.join("research_results", filename)
+def render_markdown(file_number: int, user_input: str, result: str, research_plan: Dict,
+                    execution_time: float = None, time_to_first_token: float = None, timestamp: str = None) -> str:
+    """Render the research report; missing timings are shown as in progress"""
+    timestamp = timestamp or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     # Get simplified prompt from research plan
     simplified_prompt = research_plan.get('topic_analysis', 'Topic analysis not available')
     
+    execution = f"{execution_time:.2f} seconds" if execution_time is not None else "In progress"
+    first_token = f"{time_to_first_token:.2f} seconds" if time_to_first_token is not None else "In progress"
+    
+    # Only mention deduplication when it changed something
+    dedup = research_plan.get('query_dedup') or {}
+    dedup_lines = [
+        f"- Already covered: {d['query']} (by earlier query: {d['covered_by']}, similarity {d['similarity']})"
+        for d in dedup.get('already_covered', [])
+    ] + [
+        f"- Dropped: {d['query']} (near-duplicate of: {d['duplicate_of']}, similarity {d['similarity']})"
+        for d in dedup.get('dropped', [])
+    ] + [
+        f"- Reused cached answer: {d['query']} (answered as: {d['cached_query']}, similarity {d['similarity']})"
+        for d in dedup.get('reused_from_cache', [])
+    ]
+    dedup_section = "## Query Deduplication\n" + "\n".join(dedup_lines) + "\n\n" if dedup_lines else ""
+    
+    follow_up = research_plan.get('follow_up')
+    follow_up_section = (
+        f"## Follow-up\nBuilds on research #{', #'.join(str(i) for i in follow_up['research_ids'])}: "
+        f"{follow_up['reused_findings']} earlier findings reused, {follow_up['new_searches']} new searches\n\n"
+    ) if follow_up else ""
+    
+    # Searches cut off by the research deadline are not in the findings below
+    missing = research_plan.get('missing_queries') or []
+    missing_section = (
+        "## Missing Results\nThese searches had not answered by the research deadline and are not covered:\n"
+        + "\n".join(f"- {query}" for query in missing) + "\n\n"
+    ) if missing else ""
+    
+    routing = research_plan.get('routing')
+    routing_section = ""
+    if routing:
+        routing_section = (
+            f"## Model Routing\nComplexity threshold {routing['threshold']}, "
+            f"estimated search cost ${routing['estimated_cost']:.4f}\n\n"
+            "| Query | Model | Complexity | Reason |\n|---|---|---|---|\n"
+            + "\n".join(
+                f"| {d['query']} | {d['model']} | {d['complexity']} | {d['reason']} |" for d in routing['decisions']
+            ) + "\n\n"
+        )
+    
+    metrics = research_plan.get('metrics')
+    performance_section = f"## Performance\n{metrics_markdown(metrics)}\n\n" if metrics else ""
+    
     # Format the markdown content
-    content = f"""# Research #{file_number}
+    return f"""# Research #{file_number}
 
 ## Timestamp
-{datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+{timestamp}
 
 ## Execution Time
-{execution_time:.2f} seconds
+{execution}
+
+## Time to First Token
+{first_token}
 
 ## Original Query
 {user_input}
 
-## Topic Analysis
+{follow_up_section}## Topic Analysis
 {simplified_prompt}
 
-## Findings
-{result}
-"""
+{performance_section}{routing_section}{dedup_section}{missing_section}## Findings
+{result}"""
+
+def save_to_markdown(user_input: str, result: str, research_plan: Dict, execution_time: float, time_to_first_token: float = None):
+    """Save research results to a markdown file numbered by the results store"""
+    file_number = research_plan.get('research_id')
+    if file_number is None:
+        # Not recorded by research() - register it so the number stays unique
+        store = ResultsStore()
+        file_number = store.create_research(user_input)
+        store.save_plan(file_number, research_plan)
+        store.complete_research(file_number, result, execution_time, time_to_first_token)
+        store.close()
+    filepath = report_path(file_number)
+    
+    content = render_markdown(file_number, user_input, result, research_plan, execution_time, time_to_first_token) + "\n"
     
     # Save the file
     with open(filepath, "w", encoding="utf-8") as f:
@@ -247,51 +469,325 @@ def save_to_markdown(user_input: str, result: str, research_plan: Dict, executio
     
     print(f"\n✓ Results saved to {filepath}")
 
-def research(user_input: str) -> tuple[str, Dict, float]:
-    """Main research pipeline"""
+class MarkdownReportWriter:
+    """Writes the research report while the synthesis is still streaming in.
+
+    The header is written up front and every token is appended and flushed, so a
+    crash mid-synthesis still leaves everything received so far on disk. finalize()
+    then atomically rewrites the file with the final timings.
+    """
+
+    def __init__(self, file_number: int, user_input: str, research_plan: Dict):
+        self.user_input = user_input
+        self.research_plan = research_plan
+        self.file_number = file_number
+        self.filepath = report_path(file_number)
+        self.timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.first_token_time = None
+        
+        self._file = open(self.filepath, "w", encoding="utf-8")
+        self._file.write(render_markdown(self.file_number, user_input, "", research_plan, timestamp=self.timestamp))
+        self._file.flush()
+    
+    def write(self, token: str):
+        """Append a chunk of the synthesis to the report"""
+        if self.first_token_time is None:
+            self.first_token_time = datetime.datetime.now()
+        self._file.write(token)
+        self._file.flush()
+    
+    def abort(self, error: Exception):
+        """Leave a note in the partial report explaining why it is incomplete"""
+        self._file.write(f"\n\n_Synthesis interrupted: {str(error)}_\n")
+        self._file.close()
+        print(f"\n✗ Partial results saved to {self.filepath}")
+    
+    def finalize(self, result: str, execution_time: float, time_to_first_token: float = None):
+        """Rewrite the report with the complete answer and final timings"""
+        self._file.close()
+        content = render_markdown(self.file_number, self.user_input, result, self.research_plan,
+                                  execution_time, time_to_first_token, timestamp=self.timestamp) + "\n"
+        tmp_path = self.filepath + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, self.filepath)
+        print(f"\n✓ Results saved to {self.filepath}")
+
+def export_markdown(research_id: int, store: ResultsStore = None) -> str:
+    """Re-render the markdown report of a stored research run"""
+    store = store or ResultsStore()
+    research = store.get_research(research_id)
+    if research is None:
+        raise ValueError(f"No research with ID {research_id}")
+    
+    filepath = report_path(research_id)
+    content = render_markdown(
+        research_id, research['user_input'], research['synthesis'] or "", research['research_plan'],
+        research['execution_time'], research['time_to_first_token'], timestamp=research['created_at']
+    ) + "\n"
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write(content)
+    return filepath
+
+def load_previous_research(store: ResultsStore, research_id: int) -> Dict:
+    """Question, successful findings and queries of a research run and the runs it followed up"""
+    previous = {"research_ids": [], "findings": [], "queries": []}
+    while research_id is not None and research_id not in previous["research_ids"]:
+        research = store.get_research(research_id)
+        if research is None:
+            raise ValueError(f"No research with ID {research_id}")
+        previous["research_ids"].append(research_id)
+        previous.setdefault("question", research["user_input"])
+        findings = [
+            {"query": f["query"], "response": f["response"], "model": f["model"]}
+            for f in research["findings"] if not f["error"]
+        ]
+        # Older findings first, so they read in the order they were researched
+        previous["findings"] = findings + previous["findings"]
+        research_id = (research["research_plan"].get("follow_up") or {}).get("research_ids", [None])[0]
+    previous["queries"] = [f["query"] for f in previous["findings"]]
+    print(f"✓ Follow-up to research #{previous['research_ids'][0]}: reusing {len(previous['findings'])} findings")
+    return previous
+
+async def research_async(user_input: str, cache_mode: str = None, stream: bool = False, model: str = None,
+                         store: ResultsStore = None, scheduler: SearchScheduler = None, cache: SearchCache = None,
+                         session: aiohttp.ClientSession = None, deadline: float = None,
+                         router: ModelRouter = None, follow_up: int = None,
+                         progress: Callable[[str, Dict], None] = None) -> tuple[str, Dict, float]:
+    """Main research pipeline
+
+    Each search is dispatched as soon as the query generator has finished writing
+    it, so searching overlaps with query generation instead of waiting for all queries.
+    
+    cache_mode: "use" (default), "refresh" to re-run searches and overwrite cached
+    answers, or "bypass" to skip the search cache entirely.
+    stream: print the synthesis and write the report file as tokens arrive. The
+    report path and time to first token are then added to the research plan.
+    model: Perplexity model for every search. When not given, each query is routed
+    to the small or large model by router (a ModelRouter from the environment by
+    default) and the decisions are added to the research plan as routing.
+    store: results store to record the run in; the ID it allocates is added to
+    the research plan as research_id.
+    scheduler, cache, session: shared with other pipelines running at the same time,
+    so they all stay under one concurrency and rate limit (created per run if omitted).
+    deadline: seconds after the start at which synthesis begins with whatever
+    searches have answered (RESEARCH_DEADLINE, no deadline by default). The rest
+    are cancelled and listed as missing in the report.
+    follow_up: ID of a stored research run to build on. Its findings (and those of
+    the runs it followed up) are reused, only angles they did not cover are
+    searched, and synthesis combines old and new findings.
+    progress: called as progress(event, data) as the run advances - "started",
+    "plan", "query", "search", "searches_done", "synthesis_started" and "token"
+    (one piece of the streamed synthesis).
+    """
     start_time = datetime.datetime.now()
+    # Library callers get the .env settings too; entry points load it before anything else
+    load_environment()
     print("\n=== Starting Research Process ===")
     
     # Choose mode at the start
-    model = choose_mode()
+    if model:
+        print(f"✓ Searching with {model}")
+    else:
+        router = router or ModelRouter()
+        print("✓ Routing each query to the small or large model")
+    if deadline is None and os.getenv("RESEARCH_DEADLINE"):
+        deadline = float(os.getenv("RESEARCH_DEADLINE"))
     
-    # Step 1: Generate queries
-    research_plan = generate_research_queries(user_input)
-    print("Research queries generated...")
+    store = store or ResultsStore()
+    research_id = store.create_research(user_input, model or "auto")
+    try:
+        return await _run_research(user_input, stream, model, store, research_id, start_time,
+                                   scheduler or SearchScheduler(), cache or SearchCache(mode=cache_mode), session,
+                                   deadline, router, follow_up, progress)
+    except BaseException as e:
+        store.mark_failed(research_id, f"{type(e).__name__}: {e}")
+        raise
+
+async def _run_research(user_input: str, stream: bool, model: str, store: ResultsStore, research_id: int,
+                        start_time: datetime.datetime, scheduler: SearchScheduler, cache: SearchCache,
+                        session: aiohttp.ClientSession = None, deadline: float = None,
+                        router: ModelRouter = None, follow_up: int = None,
+                        progress: Callable[[str, Dict], None] = None) -> tuple[str, Dict, float]:
+    # Synthesis is only streamed to the hook when someone is listening
+    on_token = (lambda token: progress("token", {"text": token})) if progress else None
+    progress = progress or (lambda event, data: None)
+    progress("started", {"research_id": research_id, "model": model or "auto"})
+    metrics = PipelineMetrics()
+    previous = load_previous_research(store, follow_up) if follow_up else None
+    # Near-duplicate queries are dropped, and ones already answered are served from the cache
+    # (by whichever model answered them when routing)
+    cached_models = {}
+    for search_model in ([model] if model else router.models):
+        for query in cache.cached_queries(search_model, SEARCH_SYSTEM_PROMPT):
+            cached_models.setdefault(query, search_model)
+    deduplicator = QueryDeduplicator(
+        cached_queries=list(cached_models),
+        previous_queries=previous["queries"] if previous else ()
+    )
     
-    # Step 2: Perform web searches with selected model
-    search_results = perform_web_searches(research_plan['search_queries'], model)
+    async with contextlib.AsyncExitStack() as stack:
+        if session is None:
+            session = await stack.enter_async_context(aiohttp.ClientSession(connector=scheduler.connector()))
+        tasks = []
+        
+        async def search_and_observe(query: str, i: int, search_model: str) -> Dict:
+            result = await perform_single_search(session, query, i, search_model, scheduler, cache, metrics)
+            if router and not result.get("cached"):
+                router.observe(search_model, result.get("service_time"), result["response"], len(result.get("citations", [])),
+                               result.get("completion_tokens"), bool(result.get("error")))
+            progress("search", {"query": query, "model": search_model, "error": bool(result.get("error")),
+                                "cached": bool(result.get("cached"))})
+            return result
+        
+        def dispatch(query: str):
+            search_query = deduplicator.check(query)
+            if search_query is None:
+                print(f"     ↳ Skipped as a near-duplicate of an earlier query")
+                return
+            if search_query != query:
+                print(f"     ↳ Reusing cached answer for: {search_query}")
+            if search_query in cached_models:
+                search_model = cached_models[search_query]
+            elif router:
+                search_model, decision = router.route(search_query)
+                print(f"     ↳ {search_model} ({decision['reason']})")
+            else:
+                search_model = model
+            progress("query", {"query": search_query, "model": search_model})
+            tasks.append((search_query, asyncio.create_task(
+                search_and_observe(search_query, len(tasks) + 1, search_model)
+            )))
+        
+        # Steps 1 and 2 overlap: queries are searched while the rest are generated
+        try:
+            research_plan = await generate_research_queries_async(user_input, on_query=dispatch, metrics=metrics,
+                                                                  previous=previous)
+        except BaseException:
+            for _, task in tasks:
+                task.cancel()
+            raise
+        print("Research queries generated...")
+        research_plan['query_dedup'] = deduplicator.report
+        research_plan['research_id'] = research_id
+        if previous:
+            research_plan['follow_up'] = {
+                "research_ids": previous["research_ids"],
+                "reused_findings": len(previous["findings"]),
+                "new_searches": len(tasks),
+            }
+        store.save_plan(research_id, research_plan)
+        progress("plan", {"topic_analysis": research_plan.get("topic_analysis"), "searches": len(tasks)})
+        
+        print(f"\n2. Waiting for {len(tasks)} web searches...")
+        timeout = None
+        if deadline:
+            timeout = max(0.0, deadline - (datetime.datetime.now() - start_time).total_seconds())
+        search_results = await gather_until_deadline(tasks, timeout)
+        research_plan['missing_queries'] = [r["query"] for r in search_results if r.get("missing")]
+        if router:
+            research_plan['routing'] = router.report()
+            router.save()
+        print_search_summary(search_results, scheduler, cache)
+    store.add_findings(research_id, search_results, model)
     print("Web searches completed...")
-    
-    # Step 3: Synthesize final answer
-    final_answer = synthesize_research(user_input, search_results)
+    progress("searches_done", {
+        "succeeded": sum(1 for r in search_results if not r.get("error")),
+        "failed": sum(1 for r in search_results if r.get("error") and not r.get("missing")),
+        "missing": len(research_plan['missing_queries']),
+    })
+    
+    # Step 3: Synthesize final answer, from earlier findings plus new ones on a follow-up
+    if previous:
+        search_results = previous["findings"] + search_results
+    writer = MarkdownReportWriter(research_id, user_input, research_plan) if stream else None
+    progress("synthesis_started", {"findings": len(search_results)})
+    try:
+        final_answer = await synthesize_research_async(user_input, search_results, writer, metrics, on_token)
+    except BaseException as e:
+        if writer:
+            writer.abort(e)
+        raise
     print("Research synthesis completed...")
     
     # Calculate execution time
     execution_time = (datetime.datetime.now() - start_time).total_seconds()
     
+    research_plan['metrics'] = metrics.to_dict()
+    metrics.save(os.path.splitext(report_path(research_id))[0], labels={"research_id": research_id, "model": model or "auto"})
+    
+    time_to_first_token = None
+    if writer:
+        if writer.first_token_time:
+            time_to_first_token = (writer.first_token_time - start_time).total_seconds()
+        writer.finalize(final_answer, execution_time, time_to_first_token)
+        research_plan['report_path'] = writer.filepath
+        research_plan['time_to_first_token'] = time_to_first_token
+    store.complete_research(research_id, final_answer, execution_time, time_to_first_token, research_plan)
+    
     print("\n=== Research Process Completed ===")
     print(f"Total execution time: {execution_time:.2f} seconds")
     
     return final_answer, research_plan, execution_time
 
-if __name__ == "__main__":
-    # Track code changes
-    tracker = CodeChangeTracker()
+def research(user_input: str, cache_mode: str = None, stream: bool = False, model: str = None,
+             store: ResultsStore = None, deadline: float = None, follow_up: int = None) -> tuple[str, Dict, float]:
+    """Wrapper function to run the research pipeline outside an event loop"""
+    return asyncio.run(research_async(user_input, cache_mode, stream, model, store, deadline=deadline, follow_up=follow_up))
+
+def lookup_command(question: str, limit: int):
+    """Print past research runs that already cover a question"""
+    matches = ResultsStore().lookup(question, limit)
+    if not matches:
+        print("No previous research found for this question.")
+        return
+    
+    print(f"Found {len(matches)} previous research run(s):")
+    for match in matches:
+        print(f"  #{match['id']} [{match['created_at']}] {match['user_input']} (score {match['score']})")
+        print(f"      {report_path(match['id'])}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Research assistant - runs interactively when no command is given")
+    subparsers = parser.add_subparsers(dest="command")
     
-    # Analyze changes (no need to save version separately anymore)
-    changes = tracker.analyze_changes()
+    lookup_parser = subparsers.add_parser("lookup", help="Check whether a question has been researched already")
+    lookup_parser.add_argument("question")
+    lookup_parser.add_argument("--limit", type=int, default=5)
     
-    # Update progress file if there are changes
-    if changes and changes not in ["No changes detected", "Initial state saved"]:
-        update_progress_file(changes)
+    export_parser = subparsers.add_parser("export", help="Re-export a stored research run as markdown")
+    export_parser.add_argument("research_id", type=int)
     
-    # Rest of your main code...
-    user_input = input("\nEnter your research question: ")
-    print("\nFinal Result:")
-    print("-" * 50)
-    result, research_plan, execution_time = research(user_input)
-    print(result)
+    follow_up_parser = subparsers.add_parser("follow-up", help="Research a follow-up question, reusing an earlier run's findings")
+    follow_up_parser.add_argument("research_id", type=int)
+    follow_up_parser.add_argument("question")
     
-    # Save to markdown file
-    save_to_markdown(user_input, result, research_plan, execution_time)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    load_environment()
+    args = parse_args()
+    
+    if args.command == "lookup":
+        lookup_command(args.question, args.limit)
+    elif args.command == "export":
+        print(f"✓ Exported to {export_markdown(args.research_id)}")
+    elif args.command == "follow-up":
+        result, research_plan, execution_time = research(args.question, stream=True, follow_up=args.research_id)
+    else:
+        # Track code changes
+        tracker = CodeChangeTracker()
+        
+        # Analyze changes (no need to save version separately anymore)
+        changes = tracker.analyze_changes()
+        
+        # Update progress file if there are changes
+        if changes and changes not in ["No changes detected", "Initial state saved"]:
+            update_progress_file(changes)
+        
+        # Rest of your main code...
+        user_input = input("\nEnter your research question: ")
+        print("\nFinal Result:")
+        print("-" * 50)
+        # Streaming mode prints the answer and saves the report as it is generated
+        result, research_plan, execution_time = research(user_input, stream=True)
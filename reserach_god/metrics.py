@@ -0,0 +1,203 @@
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# USD per 1M tokens (input, output) and per request - update when pricing changes
+PRICES = {
+    "gpt-4-turbo-preview": {"input": 10.00, "output": 30.00, "request": 0.0},
+    "llama-3.1-sonar-small-128k-online": {"input": 0.20, "output": 0.20, "request": 0.005},
+    "llama-3.1-sonar-large-128k-online": {"input": 1.00, "output": 1.00, "request": 0.005},
+}
+
+
+def usage_dict(usage) -> Dict:
+    """Token counts from an API usage object or dict (missing counts become 0)"""
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0}
+    if not isinstance(usage, dict):
+        usage = {"prompt_tokens": getattr(usage, "prompt_tokens", 0), "completion_tokens": getattr(usage, "completion_tokens", 0)}
+    return {
+        "prompt_tokens": usage.get("prompt_tokens") or 0,
+        "completion_tokens": usage.get("completion_tokens") or 0,
+    }
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, requests: int = 1) -> float:
+    """Estimated USD cost of a call; 0 for models without a known price"""
+    price = PRICES.get(model)
+    if not price:
+        return 0.0
+    return (prompt_tokens * price["input"] + completion_tokens * price["output"]) / 1_000_000 + requests * price["request"]
+
+
+class Span:
+    """One timed unit of work in the pipeline (a stage, a search, a map call)"""
+
+    def __init__(self, stage: str, name: str, start: float, attributes: Dict = None):
+        self.stage = stage
+        self.name = name
+        self.start = start
+        self.end = None
+        self.attributes = attributes or {}
+
+    def add_usage(self, model: str, usage, requests: int = 1):
+        """Attach token usage from an API response plus its estimated cost"""
+        tokens = usage_dict(usage)
+        self.attributes["model"] = model
+        self.attributes["prompt_tokens"] = self.attributes.get("prompt_tokens", 0) + tokens["prompt_tokens"]
+        self.attributes["completion_tokens"] = self.attributes.get("completion_tokens", 0) + tokens["completion_tokens"]
+        self.attributes["cost_usd"] = self.attributes.get("cost_usd", 0.0) + estimate_cost(
+            model, tokens["prompt_tokens"], tokens["completion_tokens"], requests
+        )
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def to_dict(self, origin: float) -> Dict:
+        return {
+            "stage": self.stage,
+            "name": self.name,
+            "start": round(self.start - origin, 4),
+            "duration": round(self.duration, 4),
+            **self.attributes,
+        }
+
+
+class PipelineMetrics:
+    """Collects spans for one research run and exports them as markdown, JSON and Prometheus text"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+
+    @contextmanager
+    def span(self, stage: str, name: str = None, **attributes):
+        """Time the body of a with-block as a span"""
+        span = Span(stage, name or stage, time.perf_counter(), attributes)
+        self.spans.append(span)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+
+    def record(self, stage: str, name: str, duration: float, **attributes) -> Span:
+        """Add a span that was timed elsewhere and just finished"""
+        end = time.perf_counter()
+        span = Span(stage, name, end - duration, attributes)
+        span.end = end
+        self.spans.append(span)
+        return span
+
+    def stages(self) -> Dict[str, Dict]:
+        """Per-stage totals; wall time runs from the first span start to the last span end"""
+        stages = {}
+        for span in self.spans:
+            stage = stages.setdefault(span.stage, {
+                "count": 0, "start": span.start, "end": span.start,
+                "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "models": set(),
+            })
+            stage["count"] += 1
+            stage["start"] = min(stage["start"], span.start)
+            stage["end"] = max(stage["end"], span.start + span.duration)
+            stage["prompt_tokens"] += span.attributes.get("prompt_tokens", 0)
+            stage["completion_tokens"] += span.attributes.get("completion_tokens", 0)
+            stage["cost_usd"] += span.attributes.get("cost_usd", 0.0)
+            if span.attributes.get("model"):
+                stage["models"].add(span.attributes["model"])
+
+        return {
+            name: {
+                "count": stage["count"],
+                "wall_time": round(stage["end"] - stage["start"], 4),
+                "prompt_tokens": stage["prompt_tokens"],
+                "completion_tokens": stage["completion_tokens"],
+                "cost_usd": round(stage["cost_usd"], 6),
+                "models": sorted(stage["models"]),
+            }
+            for name, stage in stages.items()
+        }
+
+    def search_latency(self) -> Dict[str, Dict[str, float]]:
+        """Mean and max of queue wait, time to first byte and total for non-cached searches"""
+        searches = [s for s in self.spans if s.stage == "search" and not s.attributes.get("cached")]
+        latency = {}
+        for key in ("queue_wait", "ttfb", "total"):
+            values = [s.duration if key == "total" else s.attributes.get(key) for s in searches]
+            values = [v for v in values if v is not None]
+            latency[key] = {
+                "mean": round(sum(values) / len(values), 4) if values else 0.0,
+                "max": round(max(values, default=0.0), 4),
+            }
+        return latency
+
+    def to_dict(self) -> Dict:
+        stages = self.stages()
+        return {
+            "total_time": round(max((s.start + s.duration for s in self.spans), default=self.origin) - self.origin, 4),
+            "total_cost_usd": round(sum(stage["cost_usd"] for stage in stages.values()), 6),
+            "stages": stages,
+            "search_latency": self.search_latency(),
+            "spans": [span.to_dict(self.origin) for span in self.spans],
+        }
+
+    def to_prometheus(self, labels: Optional[Dict[str, str]] = None) -> str:
+        """Prometheus text exposition format"""
+        base = ",".join(f'{k}="{v}"' for k, v in (labels or {}).items())
+
+        def label_str(**extra) -> str:
+            parts = [base] if base else []
+            parts += [f'{k}="{v}"' for k, v in extra.items()]
+            return "{" + ",".join(parts) + "}"
+
+        lines = [
+            "# HELP research_stage_wall_seconds Wall time of each pipeline stage",
+            "# TYPE research_stage_wall_seconds gauge",
+        ]
+        stages = self.stages()
+        for name, stage in stages.items():
+            lines.append(f"research_stage_wall_seconds{label_str(stage=name)} {stage['wall_time']}")
+        lines += ["# HELP research_stage_tokens Tokens used by each pipeline stage", "# TYPE research_stage_tokens gauge"]
+        for name, stage in stages.items():
+            lines.append(f"research_stage_tokens{label_str(stage=name, kind='prompt')} {stage['prompt_tokens']}")
+            lines.append(f"research_stage_tokens{label_str(stage=name, kind='completion')} {stage['completion_tokens']}")
+        lines += ["# HELP research_stage_cost_usd Estimated cost of each pipeline stage", "# TYPE research_stage_cost_usd gauge"]
+        for name, stage in stages.items():
+            lines.append(f"research_stage_cost_usd{label_str(stage=name)} {stage['cost_usd']}")
+        lines += ["# HELP research_search_seconds Perplexity search latency breakdown", "# TYPE research_search_seconds gauge"]
+        for key, values in self.search_latency().items():
+            for stat, value in values.items():
+                lines.append(f"research_search_seconds{label_str(phase=key, stat=stat)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def to_markdown(self) -> str:
+        return metrics_markdown(self.to_dict())
+
+    def save(self, base_path: str, labels: Optional[Dict[str, str]] = None):
+        """Write <base_path>.metrics.json and <base_path>.prom"""
+        with open(f"{base_path}.metrics.json", "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        with open(f"{base_path}.prom", "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus(labels))
+
+
+def metrics_markdown(data: Dict) -> str:
+    """Per-stage table for the research report, from PipelineMetrics.to_dict() output"""
+    lines = [
+        "| Stage | Calls | Wall time (s) | Prompt tokens | Completion tokens | Est. cost (USD) | Models |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for name, stage in data["stages"].items():
+        lines.append(
+            f"| {name} | {stage['count']} | {stage['wall_time']:.2f} | {stage['prompt_tokens']} | "
+            f"{stage['completion_tokens']} | {stage['cost_usd']:.4f} | {', '.join(stage['models'])} |"
+        )
+    latency = data["search_latency"]
+    lines.append("")
+    lines.append(
+        f"Searches: queue wait mean {latency['queue_wait']['mean']:.2f}s (max {latency['queue_wait']['max']:.2f}s), "
+        f"time to first byte mean {latency['ttfb']['mean']:.2f}s, total mean {latency['total']['mean']:.2f}s "
+        f"(max {latency['total']['max']:.2f}s). Total estimated cost: ${data['total_cost_usd']:.4f}"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,186 @@
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from metrics import estimate_cost
+from synthesis import estimate_tokens
+
+SMALL_MODEL = "llama-3.1-sonar-small-128k-online"
+LARGE_MODEL = "llama-3.1-sonar-large-128k-online"
+
+# Words that suggest the answer has to be backed by sources
+CITATION_WORDS = {
+    "study", "studies", "evidence", "statistics", "data", "survey", "trial", "trials", "paper",
+    "papers", "peer-reviewed", "meta-analysis", "according", "source", "sources", "report",
+    "reports", "latest", "recent", "percent", "rate", "rates", "figures", "benchmark", "benchmarks",
+}
+
+# Tokens that mark jargon: acronyms, versions/numbers, compounds, long words
+TECHNICAL_PATTERN = re.compile(r"^(?:[A-Z]{2,}\w*|\w*\d\w*|\w+-\w+(?:-\w+)*|\w{11,})$")
+
+# The search system prompt sent with every query, in tokens
+SYSTEM_PROMPT_TOKENS = 150
+# Smoothing for the running latency/quality averages
+EWMA_ALPHA = 0.2
+
+
+def query_complexity(query: str) -> Dict:
+    """Local difficulty estimate for a search query, each part and the total in 0..1"""
+    words = re.findall(r"[\w-]+", query)
+    if not words:
+        return {"length": 0.0, "technical": 0.0, "citations": 0.0, "score": 0.0}
+
+    length = min(1.0, len(words) / 25)
+    # A third of the words being jargon already makes a query hard
+    technical = min(1.0, sum(1 for w in words if TECHNICAL_PATTERN.match(w)) / len(words) * 3)
+    citation_hits = sum(1 for w in words if w.lower() in CITATION_WORDS)
+    if re.search(r"\b(19|20)\d{2}\b", query):
+        citation_hits += 1
+    citations = min(1.0, citation_hits / 2)
+
+    return {
+        "length": round(length, 3),
+        "technical": round(technical, 3),
+        "citations": round(citations, 3),
+        "score": round(0.3 * length + 0.4 * technical + 0.3 * citations, 3),
+    }
+
+
+def answer_quality(answer: str, citations: int = 0, error: bool = False) -> float:
+    """Cheap quality proxy for a search answer: sources cited and substance, in 0..1"""
+    if error or not answer:
+        return 0.0
+    return round(0.5 * min(1.0, citations / 5) + 0.5 * min(1.0, len(answer) / 2000), 3)
+
+
+class ModelRouter:
+    """Picks the Perplexity model per search query instead of per run.
+
+    Queries whose complexity score reaches the threshold go to the large model,
+    the rest to the small one. Observed latency and answer quality of each model
+    are kept as running averages across runs: when the small model's answers
+    fall behind the large model's, the threshold drops so more queries go large
+    (and rises when they keep up). A latency budget (seconds per search) and a
+    cost budget (USD per run) push queries back to the small model.
+    """
+
+    def __init__(self, small_model: str = SMALL_MODEL, large_model: str = LARGE_MODEL,
+                 latency_budget: float = None, cost_budget: float = None, threshold: float = None,
+                 stats_path: str = None):
+        self.small_model = small_model
+        self.large_model = large_model
+        self.latency_budget = latency_budget or float(os.getenv("ROUTER_LATENCY_BUDGET", "0")) or None
+        self.cost_budget = cost_budget or float(os.getenv("ROUTER_COST_BUDGET", "0")) or None
+        self.threshold = threshold if threshold is not None else float(os.getenv("ROUTER_COMPLEXITY_THRESHOLD", "0.35"))
+        self.stats_path = stats_path or os.getenv("ROUTER_STATS_PATH", os.path.join("research_results", "model_stats.json"))
+        self.stats = self._load_stats()
+        # Observations not saved yet - replayed onto the file's latest stats in save()
+        self._unsaved: List[Tuple] = []
+        self.spent = 0.0
+        self.decisions: List[Dict] = []
+
+    @property
+    def models(self) -> List[str]:
+        return [self.small_model, self.large_model]
+
+    def _load_stats(self) -> Dict[str, Dict]:
+        try:
+            with open(self.stats_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """Persist the per-model averages (atomic replace)
+
+        Other runs (batch jobs, service workers) may have saved since this router
+        loaded its stats, so this run's observations are folded into the file's
+        current contents rather than overwriting them.
+        """
+        os.makedirs(os.path.dirname(self.stats_path) or ".", exist_ok=True)
+        stats = self._load_stats()
+        for observation in self._unsaved:
+            self._fold(stats, *observation)
+        tmp_path = f"{self.stats_path}.{os.getpid()}.{id(self)}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stats, f, indent=2)
+        os.replace(tmp_path, self.stats_path)
+        self.stats = stats
+        self._unsaved = []
+
+    def _stat(self, model: str, key: str, min_count: int = 1) -> Optional[float]:
+        stats = self.stats.get(model)
+        if not stats or stats["count"] < min_count:
+            return None
+        return stats.get(key)
+
+    def effective_threshold(self) -> float:
+        """The complexity threshold, shifted by how far the small model's quality trails the large one's"""
+        small = self._stat(self.small_model, "quality", min_count=5)
+        large = self._stat(self.large_model, "quality", min_count=5)
+        if small is None or large is None:
+            return self.threshold
+        return round(min(0.9, max(0.1, self.threshold - (large - small) / 2)), 3)
+
+    def estimated_cost(self, model: str, query: str) -> float:
+        completion_tokens = self._stat(model, "completion_tokens") or 500
+        return estimate_cost(model, estimate_tokens(query) + SYSTEM_PROMPT_TOKENS, int(completion_tokens))
+
+    def route(self, query: str) -> Tuple[str, Dict]:
+        """Choose the model for one query; the decision is also kept in self.decisions"""
+        complexity = query_complexity(query)
+        threshold = self.effective_threshold()
+        if complexity["score"] >= threshold:
+            model = self.large_model
+            reason = f"complexity {complexity['score']} >= {threshold}"
+        else:
+            model = self.small_model
+            reason = f"complexity {complexity['score']} < {threshold}"
+
+        if model == self.large_model:
+            large_latency = self._stat(self.large_model, "latency")
+            small_latency = self._stat(self.small_model, "latency")
+            if (self.latency_budget and large_latency and large_latency > self.latency_budget
+                    and (small_latency is None or small_latency < large_latency)):
+                model = self.small_model
+                reason += f", large model too slow ({large_latency:.1f}s > {self.latency_budget}s budget)"
+            elif self.cost_budget and self.spent + self.estimated_cost(self.large_model, query) > self.cost_budget:
+                model = self.small_model
+                reason += f", cost budget ${self.cost_budget} nearly used up"
+
+        self.spent += self.estimated_cost(model, query)
+        decision = {"query": query, "model": model, "complexity": complexity["score"], "reason": reason}
+        self.decisions.append(decision)
+        return model, decision
+
+    def observe(self, model: str, latency: Optional[float], answer: str, citations: int = 0,
+                completion_tokens: int = None, error: bool = False):
+        """Fold one finished search into the model's running averages"""
+        observation = (model, latency, answer_quality(answer, citations, error), completion_tokens, error)
+        self._fold(self.stats, *observation)
+        self._unsaved.append(observation)
+
+    @staticmethod
+    def _fold(all_stats: Dict[str, Dict], model: str, latency: Optional[float], quality: float,
+              completion_tokens: Optional[int], error: bool):
+        stats = all_stats.setdefault(model, {"count": 0, "errors": 0})
+        values = {"quality": quality, "latency": latency, "completion_tokens": completion_tokens}
+        for key, value in values.items():
+            if value is None:
+                continue
+            previous = stats.get(key)
+            stats[key] = round(value if previous is None else (1 - EWMA_ALPHA) * previous + EWMA_ALPHA * value, 4)
+        stats["count"] += 1
+        stats["errors"] += int(error)
+
+    def report(self) -> Dict:
+        """Decisions and model averages for the research plan"""
+        return {
+            "threshold": self.effective_threshold(),
+            "latency_budget": self.latency_budget,
+            "cost_budget": self.cost_budget,
+            "estimated_cost": round(self.spent, 6),
+            "decisions": self.decisions,
+            "models": self.stats,
+        }
@@ -0,0 +1,110 @@
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "in", "into", "is", "it", "its", "of", "on", "or", "that", "the", "their",
+    "this", "to", "what", "when", "where", "which", "who", "why", "with", "vs", "versus",
+}
+
+
+def _stem(word: str) -> str:
+    """Very light suffix stripping so 'models'/'modeling'/'modeled' line up"""
+    for suffix in ("ing", "ies", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)] + ("y" if suffix == "ies" else "")
+    return word
+
+
+def query_terms(query: str) -> Counter:
+    """Stemmed content words, ignoring stopwords"""
+    words = [_stem(w) for w in re.findall(r"[a-z0-9]+", query.lower()) if w not in STOPWORDS]
+    return Counter(words)
+
+
+class QueryDeduplicator:
+    """Collapses near-identical search queries with TF-IDF cosine similarity - no network needed.
+
+    Queries are checked one at a time, so it works while the query generator is still
+    streaming. Each query is compared with the queries already accepted in this run
+    and with the queries of the research a follow-up builds on (near-duplicates are
+    dropped), and with previously answered queries from the search cache
+    (near-duplicates are swapped for the cached query, which is then a cache hit).
+    """
+
+    def __init__(self, threshold: float = None, cached_queries: Iterable[str] = (),
+                 previous_queries: Iterable[str] = ()):
+        self.threshold = threshold if threshold is not None else float(os.getenv("QUERY_DEDUP_THRESHOLD", "0.7"))
+        self._queries: List[Tuple[str, str, Counter]] = []  # (query, source, terms)
+        self._df = Counter()
+        self._postings: Dict[str, set] = defaultdict(set)
+        self.report = {"dropped": [], "reused_from_cache": [], "already_covered": []}
+
+        for query in previous_queries:
+            self._add(query, "previous")
+        for query in cached_queries:
+            self._add(query, "cache")
+
+    def _add(self, query: str, source: str):
+        terms = query_terms(query)
+        doc_id = len(self._queries)
+        self._queries.append((query, source, terms))
+        for term in terms:
+            self._df[term] += 1
+            self._postings[term].add(doc_id)
+
+    def _vector(self, terms: Counter) -> Dict[str, float]:
+        total = len(self._queries)
+        vector = {
+            term: count * (math.log((total + 1) / (self._df.get(term, 0) + 1)) + 1)
+            for term, count in terms.items()
+        }
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {term: v / norm for term, v in vector.items()}
+
+    def most_similar(self, query: str) -> Tuple[Optional[int], float]:
+        """Index of the most similar known query and its cosine similarity"""
+        terms = query_terms(query)
+        # Only queries sharing at least one term can score above zero
+        candidates = set()
+        for term in terms:
+            candidates |= self._postings.get(term, set())
+        if not candidates:
+            return None, 0.0
+
+        vector = self._vector(terms)
+        best_id, best_score = None, 0.0
+        for doc_id in candidates:
+            other = self._vector(self._queries[doc_id][2])
+            score = sum(weight * other.get(term, 0.0) for term, weight in vector.items())
+            if score > best_score:
+                best_id, best_score = doc_id, score
+        return best_id, best_score
+
+    def check(self, query: str) -> Optional[str]:
+        """Decide what to search for this query.
+
+        Returns the query to send (the query itself, or a near-identical cached
+        query), or None when it duplicates a query already accepted in this run
+        or already answered by the research being followed up.
+        """
+        doc_id, score = self.most_similar(query)
+        if doc_id is not None and score >= self.threshold:
+            match, source, _ = self._queries[doc_id]
+            if source == "run":
+                self.report["dropped"].append({"query": query, "duplicate_of": match, "similarity": round(score, 3)})
+                return None
+            if source == "previous":
+                self.report["already_covered"].append({"query": query, "covered_by": match, "similarity": round(score, 3)})
+                return None
+            if match != query:
+                self.report["reused_from_cache"].append({"query": query, "cached_query": match, "similarity": round(score, 3)})
+            # The cached query now stands for this angle, so later duplicates of it get dropped
+            self._queries[doc_id] = (match, "run", self._queries[doc_id][2])
+            return match
+
+        self._add(query, "run")
+        return query
@@ -0,0 +1,55 @@
+import json
+import re
+from typing import List
+
+# Start of the query array inside the generator's JSON answer
+SEARCH_QUERIES_START = re.compile(r'"search_queries"\s*:\s*\[')
+
+
+class SearchQueryStreamParser:
+    """Pulls search queries out of the query generator's JSON while it is still streaming.
+
+    feed() takes the next chunk of model output and returns the queries whose JSON
+    string literal has been closed since the previous call, so each search can be
+    dispatched without waiting for the rest of the answer.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = None  # Where to continue scanning inside the array
+        self.done = False
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, chunk: str) -> List[str]:
+        """Add a chunk of output and return any queries completed by it"""
+        self.buffer += chunk
+        if self.done:
+            return []
+
+        if self.position is None:
+            match = SEARCH_QUERIES_START.search(self.buffer)
+            if not match:
+                return []
+            self.position = match.end()
+
+        queries = []
+        while self.position < len(self.buffer):
+            char = self.buffer[self.position]
+            if char in " \t\r\n,":
+                self.position += 1
+            elif char == "]":
+                self.done = True
+                break
+            elif char == '"':
+                try:
+                    value, end = self._decoder.raw_decode(self.buffer, self.position)
+                except json.JSONDecodeError:
+                    # String literal not closed yet - wait for more output
+                    break
+                queries.append(value)
+                self.position = end
+            else:
+                # Not a plain list of strings; leave it to the final json.loads
+                self.done = True
+                break
+        return queries
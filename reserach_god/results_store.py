@@ -0,0 +1,241 @@
+import datetime
+import json
+import os
+import re
+import sqlite3
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS research (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    completed_at TEXT,
+    status TEXT NOT NULL DEFAULT 'running',
+    user_input TEXT NOT NULL,
+    model TEXT,
+    topic_analysis TEXT,
+    research_plan TEXT,
+    synthesis TEXT,
+    execution_time REAL,
+    time_to_first_token REAL,
+    error TEXT
+);
+
+CREATE TABLE IF NOT EXISTS findings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    research_id INTEGER NOT NULL REFERENCES research(id),
+    position INTEGER NOT NULL,
+    query TEXT NOT NULL,
+    response TEXT,
+    model TEXT,
+    error INTEGER NOT NULL DEFAULT 0,
+    cached INTEGER NOT NULL DEFAULT 0,
+    queue_wait REAL,
+    service_time REAL
+);
+
+CREATE INDEX IF NOT EXISTS findings_research ON findings(research_id, position);
+CREATE INDEX IF NOT EXISTS research_created ON research(created_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS research_fts USING fts5(user_input, topic_analysis, synthesis);
+CREATE VIRTUAL TABLE IF NOT EXISTS findings_fts USING fts5(query, response);
+"""
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query matching any of its words"""
+    words = re.findall(r"\w{3,}", text.lower())
+    return " OR ".join(f'"{w}"' for w in dict.fromkeys(words))
+
+
+class ResultsStore:
+    """SQLite store for research runs: plans, per-query findings, syntheses and timings.
+
+    It is the source of truth for past research - the markdown files in
+    research_results/ are exports. IDs come from AUTOINCREMENT inside a
+    transaction, so concurrent runs can never be given the same number.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or os.getenv("RESEARCH_DB_PATH", os.path.join("research_results", "research.db"))
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self._init_schema()
+
+    def _init_schema(self):
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            exists = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='research'"
+            ).fetchone()
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    self.conn.execute(statement)
+            if not exists:
+                self._seed_ids_from_markdown()
+
+    def _seed_ids_from_markdown(self):
+        """Continue numbering after reports written before the store existed"""
+        results_dir = os.path.dirname(self.db_path) or "."
+        numbers = [
+            int(match.group(1))
+            for f in os.listdir(results_dir)
+            if (match := re.fullmatch(r"research_(\d+)\.md", f))
+        ]
+        if numbers:
+            self.conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('research', ?)", (max(numbers),))
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    def create_research(self, user_input: str, model: str = None) -> int:
+        """Allocate the ID for a new research run"""
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            cursor = self.conn.execute(
+                "INSERT INTO research (created_at, user_input, model) VALUES (?, ?, ?)",
+                (self._now(), user_input, model)
+            )
+            research_id = cursor.lastrowid
+            self.conn.execute("INSERT INTO research_fts (rowid, user_input) VALUES (?, ?)", (research_id, user_input))
+        return research_id
+
+    def save_plan(self, research_id: int, research_plan: Dict):
+        """Store the query generator's plan"""
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.execute(
+                "UPDATE research SET topic_analysis = ?, research_plan = ? WHERE id = ?",
+                (research_plan.get("topic_analysis"), json.dumps(research_plan, ensure_ascii=False), research_id)
+            )
+            self._reindex_research(research_id)
+
+    def add_findings(self, research_id: int, search_results: List[Dict], model: str = None):
+        """Store the per-query search results in one transaction"""
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            start = self.conn.execute(
+                "SELECT COALESCE(MAX(position), 0) FROM findings WHERE research_id = ?", (research_id,)
+            ).fetchone()[0]
+            for position, result in enumerate(search_results, start + 1):
+                cursor = self.conn.execute(
+                    """INSERT INTO findings
+                       (research_id, position, query, response, model, error, cached, queue_wait, service_time)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (
+                        research_id, position, result["query"], result.get("response"),
+                        result.get("model", model), int(bool(result.get("error"))),
+                        int(bool(result.get("cached"))), result.get("queue_wait"), result.get("service_time"),
+                    )
+                )
+                if not result.get("error"):
+                    self.conn.execute(
+                        "INSERT INTO findings_fts (rowid, query, response) VALUES (?, ?, ?)",
+                        (cursor.lastrowid, result["query"], result.get("response") or "")
+                    )
+
+    def complete_research(self, research_id: int, synthesis: str, execution_time: float,
+                          time_to_first_token: float = None, research_plan: Dict = None):
+        """Store the final answer and timings"""
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.execute(
+                """UPDATE research SET status = 'completed', completed_at = ?, synthesis = ?,
+                   execution_time = ?, time_to_first_token = ?, research_plan = COALESCE(?, research_plan)
+                   WHERE id = ?""",
+                (
+                    self._now(), synthesis, execution_time, time_to_first_token,
+                    json.dumps(research_plan, ensure_ascii=False) if research_plan else None, research_id,
+                )
+            )
+            self._reindex_research(research_id)
+
+    def mark_failed(self, research_id: int, error: str):
+        """Record that a run did not finish"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE research SET status = 'failed', completed_at = ?, error = ? WHERE id = ?",
+                (self._now(), error, research_id)
+            )
+
+    def _reindex_research(self, research_id: int):
+        row = self.conn.execute(
+            "SELECT user_input, topic_analysis, synthesis FROM research WHERE id = ?", (research_id,)
+        ).fetchone()
+        self.conn.execute("DELETE FROM research_fts WHERE rowid = ?", (research_id,))
+        self.conn.execute(
+            "INSERT INTO research_fts (rowid, user_input, topic_analysis, synthesis) VALUES (?, ?, ?, ?)",
+            (research_id, row["user_input"], row["topic_analysis"] or "", row["synthesis"] or "")
+        )
+
+    def get_research(self, research_id: int) -> Optional[Dict]:
+        """A research run with its plan and findings, or None"""
+        row = self.conn.execute("SELECT * FROM research WHERE id = ?", (research_id,)).fetchone()
+        if row is None:
+            return None
+        research = dict(row)
+        research["research_plan"] = json.loads(research["research_plan"]) if research["research_plan"] else {}
+        research["findings"] = [
+            dict(finding) for finding in self.conn.execute(
+                "SELECT * FROM findings WHERE research_id = ? ORDER BY position", (research_id,)
+            )
+        ]
+        return research
+
+    def lookup(self, question: str, limit: int = 5) -> List[Dict]:
+        """Completed research runs most relevant to a question ("has this been researched already?")
+
+        Runs are ranked by BM25 over the question, topic analysis and synthesis,
+        with matching findings counted as extra evidence.
+        """
+        match = fts_query(question)
+        if not match:
+            return []
+
+        scores: Dict[int, float] = {}
+        for row in self.conn.execute(
+            "SELECT rowid, bm25(research_fts, 10.0, 2.0, 1.0) AS score FROM research_fts WHERE research_fts MATCH ?",
+            (match,)
+        ):
+            scores[row["rowid"]] = scores.get(row["rowid"], 0.0) + row["score"]
+        for row in self.conn.execute(
+            """SELECT f.research_id, bm25(findings_fts, 5.0, 1.0) AS score
+               FROM findings_fts JOIN findings f ON f.id = findings_fts.rowid
+               WHERE findings_fts MATCH ?""",
+            (match,)
+        ):
+            # bm25() is negative - lower is a better match
+            scores[row["research_id"]] = scores.get(row["research_id"], 0.0) + row["score"] * 0.2
+
+        matches = []
+        for research_id, score in sorted(scores.items(), key=lambda item: item[1]):
+            row = self.conn.execute(
+                "SELECT id, created_at, user_input, model, status FROM research WHERE id = ? AND status = 'completed'",
+                (research_id,)
+            ).fetchone()
+            if row:
+                matches.append({**dict(row), "score": round(-score, 3)})
+            if len(matches) >= limit:
+                break
+        return matches
+
+    def search_findings(self, text: str, limit: int = 10) -> List[Dict]:
+        """Past per-query findings matching the text, best first"""
+        match = fts_query(text)
+        if not match:
+            return []
+        return [
+            dict(row) for row in self.conn.execute(
+                """SELECT f.research_id, f.query, f.response, f.model
+                   FROM findings_fts JOIN findings f ON f.id = findings_fts.rowid
+                   WHERE findings_fts MATCH ? ORDER BY bm25(findings_fts, 5.0, 1.0) LIMIT ?""",
+                (match, limit)
+            )
+        ]
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+# Cache modes: "use" reads and writes, "refresh" skips reads but stores new answers,
+# "bypass" neither reads nor writes
+CACHE_MODES = ("use", "refresh", "bypass")
+
+
+class SearchCache:
+    """Content-addressed on-disk cache of search answers keyed by (model, system prompt, query).
+
+    Each entry is a small JSON file named after the SHA-256 of the key tuple. Entries
+    expire after `ttl` seconds, and once the cache grows past `max_bytes` the least
+    recently used entries (oldest mtime - hits touch the file) are evicted.
+    A small SQLite index next to the entries lists which queries are cached, so
+    finding them does not mean opening every entry; it is rebuilt from the
+    entries if it is missing.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        mode: Optional[str] = None,
+    ):
+        self.cache_dir = cache_dir or os.getenv("RESEARCH_CACHE_DIR", "search_cache")
+        self.ttl = ttl if ttl is not None else float(os.getenv("RESEARCH_CACHE_TTL", str(7 * 24 * 3600)))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("RESEARCH_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+        self.mode = mode or os.getenv("RESEARCH_CACHE_MODE", "use")
+        if self.mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{self.mode}', expected one of {CACHE_MODES}")
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._total_bytes = None
+        self._index = None
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, query: str) -> str:
+        """Stable content hash of the request tuple"""
+        raw = json.dumps([model, system_prompt, query], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _index_db(self) -> sqlite3.Connection:
+        """Connection to the query index, created (and backfilled) on first use"""
+        if self._index is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.cache_dir, "index.db"), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name='entries'"
+                ).fetchone()
+                if not exists:
+                    conn.execute(
+                        """CREATE TABLE entries (
+                               key TEXT PRIMARY KEY,
+                               model TEXT NOT NULL,
+                               system_prompt_hash TEXT NOT NULL,
+                               query TEXT NOT NULL,
+                               created_at REAL NOT NULL
+                           )"""
+                    )
+                    conn.execute("CREATE INDEX entries_model ON entries(model, system_prompt_hash, created_at)")
+                    self._backfill_index(conn)
+            self._index = conn
+        return self._index
+
+    def _backfill_index(self, conn: sqlite3.Connection):
+        """Index entries written before the index existed - a one-time scan"""
+        for _, _, path in self._entries():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (self._key_of(path), entry.get("model"), entry.get("system_prompt_hash"),
+                 entry.get("query"), entry.get("created_at", 0))
+            )
+
+    @staticmethod
+    def _key_of(path: str) -> str:
+        return os.path.basename(path)[:-len(".json")]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, model: str, system_prompt: str, query: str) -> Optional[Dict]:
+        """Return the cached entry for this request, or None on a miss"""
+        if self.mode != "use":
+            return None
+
+        path = self._path(self.make_key(model, system_prompt, query))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        if time.time() - entry.get("created_at", 0) > self.ttl:
+            self.expired += 1
+            self.misses += 1
+            self._remove(path)
+            return None
+
+        # Touching the file keeps mtime as the LRU recency marker
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return entry
+
+    def put(self, model: str, system_prompt: str, query: str, response: str):
+        """Store an answer, evicting old entries if the cache is over its size limit"""
+        if self.mode == "bypass":
+            return
+
+        key = self.make_key(model, system_prompt, query)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            "model": model,
+            "system_prompt_hash": hashlib.sha256(system_prompt.encode("utf-8")).hexdigest(),
+            "query": query,
+            "response": response,
+            "created_at": time.time(),
+        }
+
+        previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._index_db().execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+            (key, model, entry["system_prompt_hash"], query, entry["created_at"])
+        )
+
+        if self._total_bytes is not None:
+            self._total_bytes += os.path.getsize(path) - previous_size
+        if self.total_bytes() > self.max_bytes:
+            self._evict()
+
+    def _entries(self):
+        """(mtime, size, path) of every entry on disk"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for bucket in os.scandir(self.cache_dir):
+            if not bucket.is_dir():
+                continue
+            for item in os.scandir(bucket.path):
+                if item.name.endswith(".json"):
+                    stat = item.stat()
+                    entries.append((stat.st_mtime, stat.st_size, item.path))
+        return entries
+
+    def cached_queries(self, model: str, system_prompt: str) -> List[str]:
+        """Queries with a live cached answer for this model and system prompt"""
+        if self.mode != "use":
+            return []
+
+        prompt_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        rows = self._index_db().execute(
+            "SELECT query FROM entries WHERE model = ? AND system_prompt_hash = ? AND created_at >= ?",
+            (model, prompt_hash, time.time() - self.ttl)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def total_bytes(self) -> int:
+        """Size of all entries, scanned from disk once and then kept up to date"""
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self._entries())
+        return self._total_bytes
+
+    def _remove(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        self._index_db().execute("DELETE FROM entries WHERE key = ?", (self._key_of(path),))
+        if self._total_bytes is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of its limit"""
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries())
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for _, _, path in entries:
+            if self._total_bytes <= target:
+                break
+            self._remove(path)
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for this run"""
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,295 @@
+import asyncio
+import math
+import os
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+
+import aiohttp
+
+# Status codes worth retrying - everything else is returned as a failure right away
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of floats"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class TokenBucket:
+    """Token bucket that spreads requests over a requests-per-minute budget"""
+
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for a while (used when the server says Retry-After)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        # The lock is FIFO, so waiters are served in the order they arrived
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SearchScheduler:
+    """Runs Perplexity requests under a concurrency cap, an RPM budget and per-request deadlines.
+
+    Every setting falls back to an environment variable so the scheduler can be
+    pointed at a local mock server (PERPLEXITY_BASE_URL) and sized without code changes.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        requests_per_minute: Optional[float] = None,
+        request_timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        base_url: Optional[str] = None,
+        hedge: Optional[bool] = None,
+        hedge_percentile: Optional[float] = None,
+    ):
+        self.max_concurrency = max_concurrency or int(os.getenv("PERPLEXITY_MAX_CONCURRENCY", "5"))
+        self.requests_per_minute = requests_per_minute or float(os.getenv("PERPLEXITY_RPM", "50"))
+        self.request_timeout = request_timeout or float(os.getenv("PERPLEXITY_TIMEOUT", "60"))
+        self.deadline = deadline or float(os.getenv("PERPLEXITY_DEADLINE", "180"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("PERPLEXITY_MAX_RETRIES", "3"))
+        base_url = base_url or os.getenv("PERPLEXITY_BASE_URL", "https://api.perplexity.ai")
+        self.url = f"{base_url.rstrip('/')}/chat/completions"
+
+        # Hedging: if a request is still unanswered after the given percentile of
+        # recent service times, send a duplicate and take whichever answers first
+        self.hedge = hedge if hedge is not None else os.getenv("PERPLEXITY_HEDGE", "0") == "1"
+        self.hedge_percentile = hedge_percentile or float(os.getenv("PERPLEXITY_HEDGE_PERCENTILE", "90"))
+        self.hedge_min_samples = 5
+        self.hedge_initial_delay = float(os.getenv("PERPLEXITY_HEDGE_INITIAL_DELAY", "15"))
+        self.recent_service_times = deque(maxlen=200)
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._bucket = TokenBucket(self.requests_per_minute, burst=self.max_concurrency)
+
+        # Stats for sizing the scheduler
+        self.queue_waits: List[float] = []
+        self.service_times: List[float] = []
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def connector(self) -> aiohttp.TCPConnector:
+        """Connection pool sized to the concurrency limit"""
+        return aiohttp.TCPConnector(limit=self.max_concurrency)
+
+    async def _acquire_slot(self):
+        await self._semaphore.acquire()
+        try:
+            await self._bucket.acquire()
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with jitter, used when the server gives no Retry-After"""
+        return min(30.0, 2 ** (attempt - 1)) + random.uniform(0, 0.5)
+
+    def hedge_delay(self) -> float:
+        """How long a request may run before it gets hedged - adapts to observed latency"""
+        if len(self.recent_service_times) < self.hedge_min_samples:
+            return self.hedge_initial_delay
+        return _percentile(list(self.recent_service_times), self.hedge_percentile)
+
+    async def submit(self, session: aiohttp.ClientSession, payload: Dict, headers: Dict) -> Dict:
+        """Send one request (hedged when enabled) and return its outcome - see _submit"""
+        if not self.hedge:
+            return await self._submit(session, payload, headers)
+
+        started = asyncio.Event()
+        primary = asyncio.create_task(self._submit(session, payload, headers, started))
+        # The hedge timer starts once the request is actually being served, so
+        # requests held back by the rate limit are not duplicated
+        serving = asyncio.create_task(started.wait())
+        tasks = [primary, serving]
+        try:
+            await asyncio.wait([primary, serving], return_when=asyncio.FIRST_COMPLETED)
+            serving.cancel()
+            done, _ = await asyncio.wait([primary], timeout=self.hedge_delay())
+            if done:
+                return primary.result()
+
+            self.hedges += 1
+            backup = asyncio.create_task(self._submit(session, payload, headers))
+            tasks.append(backup)
+            pending = {primary, backup}
+            outcome = None
+            winner = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    outcome, winner = task.result(), task
+                    if not outcome["error"]:
+                        break
+                if outcome and not outcome["error"]:
+                    break
+
+            outcome["hedged"] = True
+            if not outcome["error"] and winner is backup:
+                self.hedge_wins += 1
+                outcome["hedge_won"] = True
+            return outcome
+        finally:
+            # Also runs when submit() itself is cancelled (e.g. the research deadline),
+            # so no request keeps using rate-limit budget or a slot after that
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _submit(self, session: aiohttp.ClientSession, payload: Dict, headers: Dict,
+                      started: Optional[asyncio.Event] = None) -> Dict:
+        """Send one request, retrying throttled and transient failures until the deadline.
+
+        Returns a dict with the parsed JSON ("data") or an "error" message, plus
+        "queue_wait" (time spent waiting for a slot, a token or a backoff),
+        "service_time" (time spent inside HTTP calls) and "ttfb" (time to the
+        response headers of the last attempt), all in seconds.
+        """
+        submitted = time.monotonic()
+        deadline_at = submitted + self.deadline
+        queue_wait = 0.0
+        service_time = 0.0
+        data = None
+        error = None
+        attempts = 0
+        ttfb = None
+
+        while True:
+            wait_start = time.monotonic()
+            try:
+                await asyncio.wait_for(self._acquire_slot(), timeout=max(0.0, deadline_at - wait_start))
+            except asyncio.TimeoutError:
+                queue_wait += time.monotonic() - wait_start
+                error = "Deadline exceeded while waiting in queue"
+                break
+
+            service_start = time.monotonic()
+            queue_wait += service_start - wait_start
+            attempts += 1
+            if started:
+                started.set()
+            retry_after = None
+            retryable = False
+            try:
+                timeout = aiohttp.ClientTimeout(total=max(0.001, min(self.request_timeout, deadline_at - service_start)))
+                async with session.post(self.url, headers=headers, json=payload, timeout=timeout) as response:
+                    # Response headers are in - time to first byte of the latest attempt
+                    ttfb = time.monotonic() - service_start
+                    if response.status in RETRYABLE_STATUSES:
+                        retryable = True
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        error = f"HTTP {response.status}"
+                        if response.status == 429:
+                            self.rate_limited += 1
+                            # Throttling applies to the whole account, so hold back every request
+                            self._bucket.pause(retry_after if retry_after is not None else self._backoff(attempts))
+                    elif response.status >= 400:
+                        error = f"HTTP {response.status}: {(await response.text())[:200]}"
+                    else:
+                        data = await response.json()
+                        error = None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                retryable = True
+                error = f"{type(e).__name__}: {str(e) or 'request timed out'}"
+            finally:
+                service_time += time.monotonic() - service_start
+                self._semaphore.release()
+
+            if not retryable or attempts > self.max_retries:
+                break
+
+            delay = retry_after if retry_after is not None else self._backoff(attempts)
+            if time.monotonic() + delay >= deadline_at:
+                error = f"{error} (deadline exceeded before retry)"
+                break
+
+            self.retries += 1
+            backoff_start = time.monotonic()
+            await asyncio.sleep(delay)
+            queue_wait += time.monotonic() - backoff_start
+
+        self.queue_waits.append(queue_wait)
+        self.service_times.append(service_time)
+        if error:
+            self.failures += 1
+        else:
+            self.recent_service_times.append(service_time)
+
+        return {
+            "data": data,
+            "error": error,
+            "attempts": attempts,
+            "queue_wait": queue_wait,
+            "service_time": service_time,
+            "ttfb": ttfb,
+        }
+
+    def summary(self) -> Dict:
+        """Queue wait and service time distribution of all requests so far"""
+        return {
+            "requests": len(self.service_times),
+            "failures": self.failures,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "queue_wait": {
+                "mean": sum(self.queue_waits) / len(self.queue_waits) if self.queue_waits else 0.0,
+                "p50": _percentile(self.queue_waits, 50),
+                "p95": _percentile(self.queue_waits, 95),
+                "max": max(self.queue_waits, default=0.0),
+            },
+            "service_time": {
+                "mean": sum(self.service_times) / len(self.service_times) if self.service_times else 0.0,
+                "p50": _percentile(self.service_times, 50),
+                "p95": _percentile(self.service_times, 95),
+                "max": max(self.service_times, default=0.0),
+            },
+        }
@@ -0,0 +1,278 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import time
+import uuid
+from typing import Dict, List
+
+import aiohttp
+from aiohttp import web
+
+from clients import get_async_openai_client, load_environment
+from main import MODELS, research_async, save_to_markdown
+from results_store import ResultsStore
+from search_cache import SearchCache
+from search_scheduler import SearchScheduler
+
+
+class ResearchJob:
+    """One submitted research question and everything that happened to it so far"""
+
+    def __init__(self, question: str, mode: str = None, follow_up: int = None, deadline: float = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.question = question
+        self.mode = mode or "auto"
+        self.follow_up = follow_up
+        self.deadline = deadline
+        self.status = "queued"
+        self.created_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.research_id = None
+        self.execution_time = None
+        self.error = None
+        self.finished_at = None
+        self.events: List[Dict] = []
+        self.listeners: List[asyncio.Queue] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def emit(self, event: str, data: Dict):
+        """Record a progress event and pass it to every connected event stream"""
+        if event == "started":
+            self.research_id = data["research_id"]
+        record = {"event": event, "data": data}
+        if event == "token" and self.events and self.events[-1]["event"] == "token":
+            # Replay keeps one event with the synthesis text so far instead of every token
+            last = self.events[-1]
+            last["data"] = {"text": last["data"]["text"] + data["text"]}
+        else:
+            self.events.append({"event": event, "data": dict(data)})
+        for queue in self.listeners:
+            queue.put_nowait(record)
+
+    def close_listeners(self):
+        for queue in self.listeners:
+            queue.put_nowait(None)
+        self.listeners = []
+        self.finished_at = time.monotonic()
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "question": self.question,
+            "mode": self.mode,
+            "follow_up": self.follow_up,
+            "status": self.status,
+            "created_at": self.created_at,
+            "research_id": self.research_id,
+            "execution_time": self.execution_time,
+            "error": self.error,
+        }
+
+
+class ResearchService:
+    """Runs research jobs from a queue with a fixed number of workers.
+
+    The search scheduler, search cache, results store and HTTP session are created
+    once and shared by every job, so all jobs stay under one concurrency and rate
+    limit and reuse warm connections. Job state lives in memory and finished jobs
+    are forgotten after job_ttl seconds; the research itself (plan, findings,
+    synthesis) stays in the results store.
+    """
+
+    def __init__(self, workers: int = None, queue_size: int = None, store: ResultsStore = None,
+                 job_ttl: float = None):
+        self.workers = workers or int(os.getenv("RESEARCH_SERVICE_WORKERS", "2"))
+        self.queue = asyncio.Queue(maxsize=queue_size or int(os.getenv("RESEARCH_SERVICE_QUEUE_SIZE", "100")))
+        self.jobs: Dict[str, ResearchJob] = {}
+        self.job_ttl = job_ttl or float(os.getenv("RESEARCH_SERVICE_JOB_TTL", "3600"))
+        self.scheduler = SearchScheduler()
+        self.cache = SearchCache()
+        self.store = store or ResultsStore()
+        self.session = None
+        self._worker_tasks = []
+
+    async def start(self, app: web.Application = None):
+        self.session = aiohttp.ClientSession(connector=self.scheduler.connector())
+        # Build the OpenAI client now so the first job does not pay for it
+        get_async_openai_client()
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        print(f"✓ Research service started with {self.workers} workers")
+
+    async def stop(self, app: web.Application = None):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        await self.session.close()
+        self.store.close()
+
+    def submit(self, question: str, mode: str = None, follow_up: int = None, deadline: float = None) -> ResearchJob:
+        """Queue a job; raises asyncio.QueueFull when the backlog is full"""
+        self.expire_jobs()
+        job = ResearchJob(question, mode, follow_up, deadline)
+        self.queue.put_nowait(job)
+        self.jobs[job.id] = job
+        return job
+
+    def expire_jobs(self):
+        """Forget jobs that finished more than job_ttl seconds ago"""
+        cutoff = time.monotonic() - self.job_ttl
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished_at and job.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job: ResearchJob):
+        job.status = "running"
+        job.emit("running", {"job_id": job.id})
+        try:
+            answer, research_plan, execution_time = await research_async(
+                job.question, model=MODELS.get(job.mode), store=self.store, scheduler=self.scheduler,
+                cache=self.cache, session=self.session, deadline=job.deadline, follow_up=job.follow_up,
+                progress=job.emit
+            )
+            save_to_markdown(job.question, answer, research_plan, execution_time)
+            job.execution_time = execution_time
+            job.status = "completed"
+            job.emit("completed", {"research_id": job.research_id, "execution_time": execution_time})
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {str(e)}"
+            job.status = "failed"
+            job.emit("failed", {"error": job.error})
+            print(f"\n✗ Job {job.id} failed: {str(e)}")
+        finally:
+            job.close_listeners()
+
+
+def _get_job(request: web.Request) -> ResearchJob:
+    service = request.app["service"]
+    service.expire_jobs()
+    job = service.jobs.get(request.match_info["job_id"])
+    if job is None:
+        raise web.HTTPNotFound(text=json.dumps({"error": "Unknown or expired job"}), content_type="application/json")
+    return job
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+async def submit_job(request: web.Request) -> web.Response:
+    """POST /jobs {"question": ..., "mode": "fast"|"quality"|"auto", "follow_up": id, "deadline": seconds}"""
+    try:
+        body = await request.json()
+    except ValueError:
+        return web.json_response({"error": "Body must be JSON"}, status=400)
+    if not isinstance(body, dict) or not body.get("question"):
+        return web.json_response({"error": "Missing question"}, status=400)
+    if body.get("mode") and body["mode"] not in list(MODELS) + ["auto"]:
+        return web.json_response({"error": f"Unknown mode '{body['mode']}'"}, status=400)
+    if body.get("deadline") is not None and not (_is_number(body["deadline"]) and body["deadline"] > 0):
+        return web.json_response({"error": "deadline must be a positive number of seconds"}, status=400)
+    if body.get("follow_up") is not None and not (isinstance(body["follow_up"], int)
+                                                  and not isinstance(body["follow_up"], bool)):
+        return web.json_response({"error": "follow_up must be a research ID (integer)"}, status=400)
+
+    try:
+        job = request.app["service"].submit(body["question"], body.get("mode"), body.get("follow_up"), body.get("deadline"))
+    except asyncio.QueueFull:
+        return web.json_response({"error": "Too many queued jobs, try again later"}, status=503)
+    return web.json_response(job.to_dict(), status=202)
+
+
+async def list_jobs(request: web.Request) -> web.Response:
+    request.app["service"].expire_jobs()
+    return web.json_response([job.to_dict() for job in request.app["service"].jobs.values()])
+
+
+async def job_status(request: web.Request) -> web.Response:
+    return web.json_response(_get_job(request).to_dict())
+
+
+async def job_events(request: web.Request) -> web.StreamResponse:
+    """Server-sent events: everything that happened so far, then live progress until the job ends"""
+    job = _get_job(request)
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    await response.prepare(request)
+
+    queue = asyncio.Queue()
+    for record in job.events:
+        queue.put_nowait(record)
+    if job.finished:
+        queue.put_nowait(None)
+    else:
+        job.listeners.append(queue)
+
+    try:
+        while True:
+            record = await queue.get()
+            if record is None:
+                break
+            await response.write(f"event: {record['event']}\ndata: {json.dumps(record['data'])}\n\n".encode("utf-8"))
+    finally:
+        if queue in job.listeners:
+            job.listeners.remove(queue)
+    return response
+
+
+async def job_result(request: web.Request) -> web.Response:
+    """The stored research run of a finished job"""
+    job = _get_job(request)
+    if job.status != "completed":
+        return web.json_response({"error": f"Job is {job.status}", **job.to_dict()}, status=409)
+    return web.json_response(request.app["service"].store.get_research(job.research_id))
+
+
+async def get_research(request: web.Request) -> web.Response:
+    research = request.app["service"].store.get_research(int(request.match_info["research_id"]))
+    if research is None:
+        return web.json_response({"error": "Unknown research"}, status=404)
+    return web.json_response(research)
+
+
+async def lookup(request: web.Request) -> web.Response:
+    """GET /lookup?q=...&limit=5 - past research covering a question"""
+    question = request.query.get("q", "")
+    try:
+        limit = int(request.query.get("limit", "5"))
+    except ValueError:
+        return web.json_response({"error": "limit must be an integer"}, status=400)
+    return web.json_response(request.app["service"].store.lookup(question, limit))
+
+
+def create_app(service: ResearchService = None) -> web.Application:
+    app = web.Application()
+    service = service or ResearchService()
+    app["service"] = service
+    app.on_startup.append(service.start)
+    app.on_cleanup.append(service.stop)
+    app.add_routes([
+        web.post("/jobs", submit_job),
+        web.get("/jobs", list_jobs),
+        web.get("/jobs/{job_id}", job_status),
+        web.get("/jobs/{job_id}/events", job_events),
+        web.get("/jobs/{job_id}/result", job_result),
+        web.get(r"/research/{research_id:\d+}", get_research),
+        web.get("/lookup", lookup),
+    ])
+    return app
+
+
+if __name__ == "__main__":
+    load_environment()
+    parser = argparse.ArgumentParser(description="Research job API: submit questions, stream progress, fetch results")
+    parser.add_argument("--host", default=os.getenv("RESEARCH_SERVICE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("RESEARCH_SERVICE_PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=None, help="Research jobs running at the same time")
+    args = parser.parse_args()
+
+    web.run_app(create_app(ResearchService(workers=args.workers)), host=args.host, port=args.port)
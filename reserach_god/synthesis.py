@@ -0,0 +1,146 @@
+import asyncio
+import math
+import os
+from typing import Dict, List, Tuple
+
+from metrics import PipelineMetrics
+
+# Rough average for English prose with the OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate, good enough for budgeting prompts"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to roughly max_tokens"""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + " [...]"
+
+
+def format_findings(findings: List[Dict]) -> str:
+    """Plain-text findings block - much cheaper than indented JSON with escaped newlines"""
+    return "\n\n".join(
+        f"### {i}. {finding['query']}\n{finding['response'].strip()}"
+        for i, finding in enumerate(findings, 1)
+    )
+
+
+def batch_findings(findings: List[Dict], token_budget: int) -> List[List[Dict]]:
+    """Greedily pack findings into batches that each fit in token_budget"""
+    batches = []
+    current = []
+    current_tokens = 0
+    for finding in findings:
+        tokens = estimate_tokens(format_findings([finding]))
+        if tokens > token_budget:
+            # One oversized answer gets its own, truncated batch
+            finding = {**finding, "response": truncate_to_tokens(finding["response"], token_budget - estimate_tokens(finding["query"]) - 10)}
+            tokens = token_budget
+        if current and current_tokens + tokens > token_budget:
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(finding)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+MAP_PROMPT = """
+    Original user query: {original_prompt}
+
+    Below is a batch of research findings. Condense them into a dense set of notes
+    for a writer who will combine them with other batches:
+
+    1. Keep every fact, number, date and named source that is relevant to the user's query
+    2. Keep citations next to the claims they support
+    3. Drop repetition, filler and anything unrelated to the query
+    4. Note explicit disagreements between findings
+    5. Use short bullet points grouped by theme
+
+    Findings:
+    {findings}
+    """
+
+
+class MapReduceSynthesizer:
+    """Fits any number of search findings into the synthesis prompt's token budget.
+
+    If the formatted findings fit, they are passed through untouched (single pass).
+    Otherwise they are packed into batches, each batch is condensed in parallel
+    (map), and the condensed notes are treated as new findings - repeating level
+    by level until everything fits (reduce).
+    """
+
+    def __init__(self, client, token_budget: int = None, model: str = None, max_parallel: int = None,
+                 metrics: PipelineMetrics = None):
+        self.client = client
+        self.metrics = metrics or PipelineMetrics()
+        self.token_budget = token_budget or int(os.getenv("SYNTHESIS_TOKEN_BUDGET", "12000"))
+        self.model = model or os.getenv("SYNTHESIS_MAP_MODEL", "gpt-4-turbo-preview")
+        self.max_parallel = max_parallel or int(os.getenv("SYNTHESIS_MAP_CONCURRENCY", "5"))
+        # Each map output must be well under the budget so every level shrinks the input
+        self.summary_tokens = max(256, min(1500, self.token_budget // 4))
+
+    async def _summarize(self, semaphore: asyncio.Semaphore, original_prompt: str, batch: List[Dict], level: int) -> str:
+        async with semaphore:
+            with self.metrics.span("synthesis_map", f"level {level}", findings=len(batch)) as span:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": MAP_PROMPT.format(
+                        original_prompt=original_prompt,
+                        findings=format_findings(batch),
+                    )}],
+                    max_tokens=self.summary_tokens
+                )
+                span.add_usage(self.model, response.usage)
+        return response.choices[0].message.content
+
+    async def prepare(self, original_prompt: str, findings: List[Dict]) -> Tuple[str, Dict]:
+        """Return the findings text for the final prompt and a description of how it was built"""
+        text = format_findings(findings)
+        info = {
+            "mode": "single-pass",
+            "levels": 0,
+            "input_tokens": estimate_tokens(text),
+            "token_budget": self.token_budget,
+        }
+        if info["input_tokens"] <= self.token_budget:
+            return text, info
+
+        info["mode"] = "map-reduce"
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        # Leave room in each map call for the instructions around the findings
+        # A batch must hold at least two full summaries with their headers, or levels stop shrinking
+        header_tokens = estimate_tokens(format_findings([{"query": "Condensed notes 999 (level 99)", "response": ""}])) + 1
+        batch_budget = max((self.summary_tokens + header_tokens) * 2,
+                           self.token_budget - estimate_tokens(MAP_PROMPT) - estimate_tokens(original_prompt))
+        while estimate_tokens(text) > self.token_budget:
+            batches = batch_findings(findings, batch_budget)
+            if info["levels"] and len(batches) >= len(findings):
+                # Another level would not reduce the number of notes - cut to the budget instead
+                text = truncate_to_tokens(text, self.token_budget)
+                break
+            info["levels"] += 1
+            print(f"   Map-reduce level {info['levels']}: condensing {len(findings)} findings in {len(batches)} batches...")
+            summaries = await asyncio.gather(*[
+                self._summarize(semaphore, original_prompt, batch, info["levels"]) for batch in batches
+            ])
+            findings = [
+                {"query": f"Condensed notes {i} (level {info['levels']})", "response": summary}
+                for i, summary in enumerate(summaries, 1)
+            ]
+            text = format_findings(findings)
+            if len(batches) == 1:
+                # A single summary is as small as it gets
+                text = truncate_to_tokens(text, self.token_budget)
+                break
+
+        info["output_tokens"] = estimate_tokens(text)
+        return text, info
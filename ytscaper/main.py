@@ -1,11 +1,17 @@
 import os
+import sys
 import logging
 import agentql
+from pathlib import Path
 from threading import Timer
 from openai import OpenAI
 from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright
 
+# The lean browser profile is shared with the other scrapers in this repo
+sys.path.append(str(Path(__file__).resolve().parent.parent / "browser_profile"))
+from lean_browser import context_options, error_screenshot_path, install_sync, launch_options
+
 # Load environment variables
 load_dotenv()
 
@@ -35,20 +41,31 @@ VIDEO_QUERY = """
 # Scrape YouTube data
 def scrape_youtube_channel(channel_url):
     print(f"\nStarting to scrape: {channel_url}")
-    with sync_playwright() as playwright, playwright.chromium.launch(headless=False) as browser:
+    # Lean profile: headless unless BROWSER_HEADLESS=0, no images, media, fonts or trackers
+    with sync_playwright() as playwright, playwright.chromium.launch(**launch_options()) as browser:
         print("Browser launched")
-        page = agentql.wrap(browser.new_page())
-        print("Navigating to page...")
-        page.goto(channel_url)
-        
-        print("Waiting for page to load...")
-        # Wait for content to load
-        page.wait_for_page_ready_state()
-        
-        # Get video data
-        print("Executing AgentQL query...")
-        response = page.query_data(VIDEO_QUERY)
-        videos = response.get('videos', [])
+        context = browser.new_context(**context_options())
+        request_filter = install_sync(context)
+        page = agentql.wrap(context.new_page())
+        try:
+            print("Navigating to page...")
+            page.goto(channel_url)
+            
+            print("Waiting for page to load...")
+            # Wait for content to load
+            page.wait_for_page_ready_state()
+            
+            # Get video data
+            print("Executing AgentQL query...")
+            response = page.query_data(VIDEO_QUERY)
+            videos = response.get('videos', [])
+        except Exception:
+            # Screenshots are only taken when something went wrong
+            screenshot = error_screenshot_path("youtube_scrape")
+            page.screenshot(path=screenshot)
+            log.error(f"Scrape failed, screenshot saved to {screenshot}")
+            raise
+        log.info(f"Requests blocked: {request_filter.blocked}, allowed: {request_filter.allowed}")
         
         # Extract just the number from views, regardless of language
         def extract_views(view_string):